@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+"""
+Copyright(C) 2026, BrucesHobbies
+All Rights Reserved
+
+AUTHOR: BrucesHobbies
+DATE: 10/17/2026
+REVISION HISTORY
+  DATE        AUTHOR          CHANGES
+  yyyy/mm/dd  --------------- -------------------------------------
+
+
+OVERVIEW:
+    Black box recorder of the per tick vacuum readings around alerts.
+
+    The last preSeconds + postSeconds of readings are kept in fixed size
+    arrays used as a ring buffer. trigger() names a snapshot file right
+    away, so the name can go in the alert message, and the file is written
+    once postSeconds of readings after the alert have been added. It holds
+    the readings from preSeconds before to postSeconds after the alert as
+    gzip compressed csv, about 10 kB for 15 minutes at one reading per
+    second. Alerts during a pending snapshot share its file.
+
+LICENSE:
+    This program code and documentation are for personal private use only.
+    No commercial use of this code is allowed without prior written consent.
+
+    This program is free for you to inspect, study, and modify for your
+    personal private use.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import time
+import math
+import array
+import gzip
+import threading
+
+
+HDR = "UNIX time (s),Inches w.c."
+
+
+class BlackBox :
+    def __init__(self, preSeconds=600, postSeconds=300, interval=1, prefix="RadonMaster_BlackBox") :
+        self.preSeconds = preSeconds
+        self.postSeconds = postSeconds
+        self.prefix = prefix
+        self.size = int((preSeconds + postSeconds) / interval) + 2
+
+        self.times = array.array('d', bytes(8 * self.size))   # ring buffer of UNIX times
+        self.values = array.array('f', bytes(4 * self.size))  # ring buffer of readings, NaN when failed
+        self.head = 0                                         # readings added
+
+        self.pending = []        # [alert time, filename, reasons] waiting for post alert readings
+        self.snapshots = 0       # snapshot files written
+        self.__lock = threading.Lock()
+
+
+    # Add one reading, None for a failed read
+    def add(self, tsec, value) :
+        with self.__lock :
+            i = self.head % self.size
+            self.times[i] = tsec
+            self.values[i] = math.nan if value is None else value
+            self.head += 1
+
+            due = [p for p in self.pending if tsec >= p[0] + self.postSeconds]
+
+        for p in due :
+            self.__write(p)
+
+
+    # Start a snapshot for an alert at tsec. Returns the snapshot filename.
+    def trigger(self, reason="", tsec=None) :
+        if tsec is None :
+            tsec = time.time()
+
+        with self.__lock :
+            for p in self.pending :
+                if tsec < p[0] + self.postSeconds :
+                    p[2].append(reason)
+                    return p[1]
+
+            filename = time.strftime(self.prefix + "_%Y%m%d-%H%M%S.csv.gz", time.localtime(tsec))
+            self.pending.append([tsec, filename, [reason]])
+
+        return filename
+
+
+    # Write pending snapshots with the readings so far, e.g. at program exit
+    def close(self) :
+        for p in list(self.pending) :
+            self.__write(p)
+
+
+    def __write(self, p) :
+        with self.__lock :
+            if p not in self.pending :
+                return
+            self.pending.remove(p)
+
+            tAlert = p[0]
+            start = max(0, self.head - self.size)
+            rows = []
+            for n in range(start, self.head) :
+                i = n % self.size
+                t = self.times[i]
+                if tAlert - self.preSeconds <= t <= tAlert + self.postSeconds :
+                    rows.append('{0:.3f},{1:.4f}\n'.format(t, self.values[i]))
+
+        try :
+            with gzip.open(p[1], "wt", encoding='utf-8') as snapFile :
+                snapFile.write("# Alert at {0:.3f} {1:s}\n".format(tAlert, " | ".join(r for r in p[2] if r)))
+                snapFile.write(HDR + "\n")
+                snapFile.writelines(rows)
+            self.snapshots += 1
+
+        except OSError as e :
+            print("Error writing snapshot " + p[1] + ": " + str(e))
+
+# end class BlackBox
+
+
+#
+# Test / debug
+#
+if __name__ == '__main__':
+
+    box = BlackBox(preSeconds=60, postSeconds=30)
+    t0 = time.time()
+    for n in range(300) :
+        if n == 200 :
+            print("Snapshot: " + box.trigger("Alert: test", t0 + n))
+        if n == 210 :
+            print("Snapshot: " + box.trigger("Alert: second", t0 + n))
+        box.add(t0 + n, None if n % 50 == 0 else 1.0 - 0.5 * (n >= 200))
+
+    print(box.snapshots, box.pending)
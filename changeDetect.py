@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+"""
+Copyright(C) 2026, BrucesHobbies
+All Rights Reserved
+
+AUTHOR: BrucesHobbies
+DATE: 10/17/2026
+REVISION HISTORY
+  DATE        AUTHOR          CHANGES
+  yyyy/mm/dd  --------------- -------------------------------------
+
+
+OVERVIEW:
+    Two sided CUSUM change point detector for the vacuum readings.
+
+    Each reading's deviation from the baseline, in units of the reading
+    noise (std), is accumulated on an up and a down side. Deviations
+    smaller than the slack are forgotten, so gusts that average out never
+    build up, while a small sustained step (a clogged intake, a slowing
+    fan) keeps adding until the sum passes the threshold. The time to
+    detect a step of d std is about threshold / (d - slack) readings.
+
+    A side stays in alarm until its sum decays back to zero, the sum is
+    capped at twice the threshold so recovery takes a bounded time after
+    the vacuum returns to the baseline.
+
+    Each update is a few additions, O(1) time and memory per reading.
+
+LICENSE:
+    This program code and documentation are for personal private use only.
+    No commercial use of this code is allowed without prior written consent.
+
+    This program is free for you to inspect, study, and modify for your
+    personal private use.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+# update() results
+STEP_DOWN = -1
+NO_CHANGE = 0
+STEP_UP = 1
+
+
+class Cusum :
+    def __init__(self, slack=1.0, threshold=30.0) :
+        self.slack = slack              # std, smaller deviations are ignored
+        self.threshold = threshold      # std * readings, sum that signals a step
+        self.reset()
+
+
+    def reset(self) :
+        self.gUp = 0.0
+        self.gDown = 0.0
+        self.state = NO_CHANGE
+
+
+    # Returns STEP_UP or STEP_DOWN while a step is detected, otherwise NO_CHANGE
+    def update(self, x, target, sigma) :
+        z = (x - target) / sigma
+        cap = 2.0 * self.threshold
+
+        self.gUp = min(cap, max(0.0, self.gUp + z - self.slack))
+        self.gDown = min(cap, max(0.0, self.gDown - z - self.slack))
+
+        if self.state == NO_CHANGE :
+            if self.gDown > self.threshold :
+                self.state = STEP_DOWN
+            elif self.gUp > self.threshold :
+                self.state = STEP_UP
+
+        elif (self.state == STEP_DOWN and self.gDown == 0.0) or (self.state == STEP_UP and self.gUp == 0.0) :
+            self.state = NO_CHANGE
+
+        return self.state
+
+# end class Cusum
+
+
+#
+# Test / debug
+#
+if __name__ == '__main__':
+
+    import random
+
+    cusum = Cusum()
+    state = NO_CHANGE
+    for i in range(900) :
+        x = 1.0 + random.gauss(0, 0.05)
+        if 300 <= i < 600 :
+            x = x - 0.15    # 3 std step down, well under a 0.4 in.wc delta
+
+        newState = cusum.update(x, 1.0, 0.05)
+        if newState != state :
+            print(i, newState)
+            state = newState
@@ -26,7 +26,14 @@
 # DATE          NAME             COMMENTS
 # 2020-12-02    BrucesHobbies    Updated from python2 to python3
 #                                Changed script to callable functions
-
+# 2026-10-17    BrucesHobbies    Added scanWaves() returning serial to MAC address
+#                                map, saved to and loaded from waveMacCache.json
+#                                findWave() returns 0 instead of failing if no
+#                                WavePlus is found
+#                                scanWaves() looks for several serial numbers
+
+import os
+import json
 import time
 import struct
 
@@ -52,45 +59,78 @@ except :
     bluePyFound = 0
 
 
-def findWave() :
-    serial_no = ""
-    attempts = 3
+CACHE_FILE = "waveMacCache.json"     # serial number to MAC address, kept between runs
+
+
+#
+# Scan for Airthings devices, returns {serial number: MAC address}
+#   Stops early once every one of serialNumbers has been seen, with none
+#   given all attempts are made to find every device in range
+#
+def scanWaves(serialNumbers=(), attempts=3, seconds=2.0) :
+    found = {}
 
     if not bluePyFound :
-        return 0
+        return found
 
     scanner = Scanner().withDelegate(ScanDelegate())
 
     try:
-        while not serial_no and attempts :
+        while attempts and not (serialNumbers and all(sn in found for sn in serialNumbers)) :
             attempts = attempts - 1
-            devices = scanner.scan(2.0)
+            devices = scanner.scan(seconds)
 
             for dev in devices:
-                ManuData = ""
-                ManuDataHex = []
-                for (adtype, desc, value) in dev.getScanData():
-                    if (desc == "Manufacturer"):
-                        ManuData = value
-
-                    if (ManuData == ""):
-                        continue
+                ManuData = dev.getValueText(255)
+                if not ManuData :
+                    continue
 
-                    for i, j in zip (ManuData[::2], ManuData[1::2]):
-                        ManuDataHex.append(int(i+j, 16))
+                ManuDataHex = bytearray.fromhex(ManuData)
 
-                    #Start decoding the raw Manufacturer data
-                    if ((ManuDataHex[0] == 0x34) and (ManuDataHex[1] == 0x03)):
-                        serial_no = str(256*256*256*ManuDataHex[5] + 256*256*ManuDataHex[4] + 256*ManuDataHex[3] + ManuDataHex[2])
+                #Start decoding the raw Manufacturer data
+                if (len(ManuDataHex) >= 6) and (ManuDataHex[0] == 0x34) and (ManuDataHex[1] == 0x03):
+                    serial_no = 256*256*256*ManuDataHex[5] + 256*256*ManuDataHex[4] + 256*ManuDataHex[3] + ManuDataHex[2]
+                    if serial_no not in found :
                         print("Airthings addr %s (%s), RSSI=%d dB, SN=%s\n" % (dev.addr, dev.addrType, dev.rssi, serial_no))
-                    else:
-                        continue
+                    found[serial_no] = dev.addr
 
-    except DecodeErrorException:
+    except (DecodeErrorException, ValueError):
         pass
 
-    return int(serial_no)
+    return found
+
+
+def findWave() :
+    found = scanWaves()
+    if found :
+        saveCache(found)
+        return list(found)[-1]    # last device seen, as before
+    return 0
+
+
+#
+# Serial number to MAC address cache
+#
+def loadCache(fileName=CACHE_FILE) :
+    try :
+        with open(fileName, 'r') as f :
+            return {int(sn): mac for sn, mac in json.load(f).items()}
+    except (IOError, ValueError, AttributeError) :
+        return {}
+
+
+def saveCache(found, fileName=CACHE_FILE) :
+    cache = loadCache(fileName)
+    cache.update(found)
+    try :
+        tmpName = fileName + ".tmp"
+        with open(tmpName, 'w') as f :
+            json.dump({str(sn): mac for sn, mac in cache.items()}, f)
+        os.replace(tmpName, fileName)
+    except IOError as e :
+        print("Failed to save " + fileName + ": " + str(e))
 
 
 if __name__ == '__main__':
     print("Serial_no: ", findWave())
+    print("Cache: ", loadCache())
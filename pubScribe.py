@@ -10,6 +10,18 @@ REVISION HISTORY
   DATE        AUTHOR          CHANGES
   yyyy/mm/dd  --------------- ------------------------------------------------
   2021/04/14  BrucesHobbies   Added support for Antonio's variable tone buzzer
+  2026/10/17  BrucesHobbies   pubRecord() queues records to per destination
+                              dispatch workers with backpressure policies
+                              CSV logs kept open with buffered, batched flush
+                              Email batches sent over one SMTP session
+                              Added alert digest with severities
+                              Added BIN_FILE fixed record binary log
+                              Log files partitioned by day or month, closed
+                              csv partitions compressed in the background
+                              Sparse time index (.idx) kept for csv logs,
+                              entries written after their rows are flushed
+                              pubRecord() accepts a record time (tsec)
+                              CSV file with a changed header moved aside
 
 
 OVERVIEW:
@@ -57,9 +69,19 @@ sudo pip3 install paho-mqtt
 """
 
 import os
-import sys
 import time
 import datetime
+import json
+import threading
+import collections
+import traceback
+import atexit
+import struct
+import math
+import re
+import gzip
+import shutil
+import queue
 
 
 #
@@ -68,6 +90,8 @@ import datetime
 #
 CSV_FILE_ENABLED  = 1
 
+BIN_FILE_ENABLED  = 0    # Fixed record binary log, read with radonMasterPlot.importBin()
+
 EMAIL_SMS_ENABLED = 1
 
 IP_PORT_ENABLED   = 0    # Future
@@ -90,6 +114,45 @@ INFLUX_DBNAME     = "sensor_data"
 BUZZER_ENABLED = 0
 buzzerPIN = 18                         # Customize based on your wiring
 
+# DISPATCH QUEUES
+#   pubRecord() only queues a record, worker threads per destination do the I/O.
+#   Policy when a queue is full:
+#     DROP_OLDEST - discard the oldest queued record
+#     BLOCK       - wait up to QUEUE_BLOCK_TIMEOUT seconds, then drop the new record
+#     COALESCE    - replace a queued record of the same topic, else drop the oldest
+QUEUE_ENABLED       = 1
+QUEUE_SIZE          = 500              # records per destination
+QUEUE_BLOCK_TIMEOUT = 1.0              # seconds
+QUEUE_DRAIN_TIMEOUT = 30.0             # seconds to drain queues on disconnect
+
+# CSV FILES
+#   Log files are kept open and lines are buffered to reduce SD card wear.
+CSV_MAX_OPEN_FILES  = 8                # least recently used file is closed beyond this
+CSV_FLUSH_LINES     = 20               # flush a file after this many buffered lines
+CSV_FLUSH_SECS      = 60               # flush a file when its oldest buffered line is this old
+CSV_FSYNC           = 0                # non zero calls os.fsync() after every flush
+
+# LOG PARTITIONS
+#   Log files are split by local date: topic_yyyy-mm.csv or topic_yyyy-mm-dd.csv
+#   Closed csv partitions are compressed in the background (binary logs stay
+#   uncompressed so they can be memory mapped).
+LOG_PARTITION = 'month'                # '' = single file per topic, 'day', or 'month'
+LOG_COMPRESS  = 'gzip'                 # '' = none, 'gzip', or 'zstd' (sudo pip3 install zstandard)
+
+# CSV INDEX
+#   Sidecar file (log.csv.idx) of (UNIX time, byte offset) pairs, one every
+#   CSV_INDEX_ROWS rows, so readers can seek to a time instead of scanning.
+CSV_INDEX_ENABLED = 1
+CSV_INDEX_ROWS    = 60
+
+# ALERT DIGEST
+#   Non critical alerts are collected for ALERT_DIGEST_WINDOW seconds, repeats of
+#   the same topic and severity are merged, and one digest message is sent.
+#   CRITICAL alerts are always sent at once.
+ALERT_DIGEST_ENABLED = 1
+ALERT_DIGEST_WINDOW  = 300             # seconds
+ALERT_DIGEST_REASONS = 5               # distinct "Alert:" reason lines kept per topic and severity
+
 
 # --- END USER CONFIGURATION ---
 
@@ -112,6 +175,7 @@ if BUZZER_ENABLED :
 def connectPubScribe() :
     global mqttClient
     global influxClient
+    global sinkQueues
 
     if MQTT_ENABLED :
         mqttClient.connect(MQTT_HOST, MQTT_PORT, MQTT_KEEPALIVE_INTERVAL)
@@ -128,11 +192,33 @@ def connectPubScribe() :
         GPIO.setmode(GPIO.BCM)              # Set the pin mode to BOARD mode
         GPIO.setup(buzzerPIN, GPIO.OUT)     # Buzzer is output mode
 
+    if QUEUE_ENABLED :
+        sinkQueues = {}
+        for dest, policy, workers in sinkConfig :
+            sinkQueues[dest] = SinkQueue(dest, dispatchers[dest], policy, QUEUE_SIZE, workers, idleHandlers.get(dest))
+            sinkQueues[dest].start()
+
     return
 
 
 
 def disconnectPubScribe() :
+    global sinkQueues
+
+    # Drain queued records before closing connections
+    for dest in sinkQueues :
+        sinkQueues[dest].stop(QUEUE_DRAIN_TIMEOUT)
+    sinkQueues = {}
+
+    csvWriter.close()
+    binWriter.close()
+
+    if EMAIL_SMS_ENABLED :
+        # Send any alerts still waiting for the digest window
+        if alertDigest.pending() :
+            sendEmail.send_mails([alertMail(*alertDigest.take())])
+        sendEmail.closeSession()
+
     if MQTT_ENABLED :
         mqttClient.disconnect()
 
@@ -148,31 +234,242 @@ def attachFunction() :
 # Destinations
 MQTT = 'MQTT'
 CSV_FILE = 'CSV_FILE'
+BIN_FILE = 'BIN_FILE'
 EMAIL_SMS = 'EMAIL_SMS'
 INFLUX_DB = 'INFLUX_DB'
 BUZZER = 'BUZZER'
 
+# Alert severities
+CRITICAL = 'CRITICAL'  # sent at once
+WARNING = 'WARNING'
+INFO = 'INFO'
+
 
 #
-# Publish data record
-# dest: [MQTT, CSV_FILE, EMAIL_SMS, INFLUX_DB]
-# topic: 'topic/subtopic', 'topic/subtopic/alert', or etc.
-# data: dict, list, or str
+# Dispatch queue for one destination.
+#   Bounded deque drained by one or more worker threads. The handler is called
+#   with a list of records so a worker can batch I/O (one flush, one session).
+#   Record: (topic, data, hdr, tsec, severity)
 #
-def pubRecord(dest, topic, data, hdr="") :
-    # print("DEST: ", dest, " TOPIC: ", topic, " DATA: ", data, " HDR: ", hdr)
+DROP_OLDEST = 'DROP_OLDEST'
+BLOCK = 'BLOCK'
+COALESCE = 'COALESCE'
+
+class SinkQueue :
+    def __init__(self, dest, handler, policy=DROP_OLDEST, maxSize=QUEUE_SIZE, workers=1, idleHandler=None, idleInterval=1.0, batchSize=50) :
+        self.dest = dest
+        self.handler = handler
+        self.policy = policy
+        self.maxSize = maxSize
+        self.nWorkers = workers
+        self.idleHandler = idleHandler    # called by a worker when no records arrive within idleInterval
+        self.idleInterval = idleInterval
+        self.batchSize = batchSize        # most records handed to the handler at once
+
+        self.queued = 0        # records accepted
+        self.sent = 0          # records handled
+        self.dropped = 0       # records lost to backpressure
+        self.coalesced = 0     # records replaced by a newer record of the same topic
+        self.errors = 0        # handler exceptions
+        self.maxDepth = 0
+
+        self.__records = collections.deque()
+        self.__cond = threading.Condition()
+        self.__running = False
+        self.__threads = []
+
+
+    def start(self) :
+        self.__running = True
+        for i in range(self.nWorkers) :
+            t = threading.Thread(target=self.__worker, name="pubScribe-" + self.dest + "-" + str(i), daemon=True)
+            t.start()
+            self.__threads.append(t)
+
+
+    def stop(self, timeout=None) :
+        with self.__cond :
+            self.__running = False
+            self.__cond.notify_all()
+
+        # Workers drain remaining records before exiting
+        for t in self.__threads :
+            t.join(timeout)
+        self.__threads = []
+
+
+    def depth(self) :
+        return len(self.__records)
+
+
+    def put(self, record) :
+        with self.__cond :
+            if len(self.__records) >= self.maxSize :
+                if self.policy == BLOCK :
+                    deadline = time.monotonic() + QUEUE_BLOCK_TIMEOUT
+                    while len(self.__records) >= self.maxSize :
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 :
+                            self.dropped += 1
+                            return False
+                        self.__cond.wait(remaining)
+
+                elif self.policy == COALESCE and self.__coalesce(record) :
+                    return True
+
+                else :
+                    self.__records.popleft()
+                    self.dropped += 1
+
+            self.__records.append(record)
+            self.queued += 1
+            self.maxDepth = max(self.maxDepth, len(self.__records))
+            self.__cond.notify_all()
+
+        return True
+
+
+    def __coalesce(self, record) :
+        # Replace the newest queued record with the same topic
+        for i in range(len(self.__records)-1, -1, -1) :
+            if self.__records[i][0] == record[0] :
+                self.__records[i] = record
+                self.coalesced += 1
+                return True
+        return False
+
+
+    def __worker(self) :
+        while True :
+            with self.__cond :
+                if not self.__records and self.__running :
+                    self.__cond.wait(self.idleInterval)
+
+                if not self.__records :
+                    if not self.__running :
+                        break
+                    batch = []
+                else :
+                    n = min(len(self.__records), self.batchSize)
+                    batch = [self.__records.popleft() for i in range(n)]
+                    self.__cond.notify_all()    # wake producers waiting with BLOCK
+
+            try :
+                if batch :
+                    self.handler(batch)
+                    self.sent += len(batch)
+                elif self.idleHandler :
+                    self.idleHandler()
+
+            except Exception :
+                self.errors += 1
+                print("pubScribe " + self.dest + " dispatch exception:")
+                traceback.print_exc()
+
+        if self.idleHandler :
+            self.idleHandler()
+
+# end class SinkQueue
+
+
+#
+# Alert digest.
+#   Collects alerts over a window keyed by (topic, severity). Repeats keep the
+#   first and last time, a count, the latest message, and the first few distinct
+#   reason lines ("Alert: ...") so different alerts on one topic are not lost.
+#   take() returns (subj, msg) for one digest email and starts a new window.
+#
+class AlertDigest :
+    def __init__(self, window=ALERT_DIGEST_WINDOW, maxReasons=ALERT_DIGEST_REASONS) :
+        self.window = window
+        self.maxReasons = maxReasons
+        self.digests = 0       # digest messages produced
+        self.merged = 0        # alerts merged into an existing entry
+
+        self.__alerts = collections.OrderedDict()    # (topic, severity): [first tsec, last tsec, count, msg, reasons]
+        self.__windowStart = 0.0
+        self.__lock = threading.Lock()
+
+
+    def add(self, topic, severity, msg, tsec) :
+        with self.__lock :
+            if not self.__alerts :
+                self.__windowStart = time.monotonic()
+
+            reasons = [line for line in msg.split("\n") if line.startswith("Alert:")]
+
+            key = (topic, severity)
+            if key in self.__alerts :
+                entry = self.__alerts[key]
+                entry[1] = tsec
+                entry[2] += 1
+                entry[3] = msg
+                for reason in reasons :
+                    if not (reason in entry[4]) and len(entry[4]) < self.maxReasons :
+                        entry[4].append(reason)
+                self.merged += 1
+            else :
+                self.__alerts[key] = [tsec, tsec, 1, msg, reasons[:self.maxReasons]]
+
+
+    def pending(self) :
+        return len(self.__alerts)
+
+
+    def due(self) :
+        return bool(self.__alerts) and (time.monotonic() - self.__windowStart) >= self.window
+
+
+    def take(self) :
+        with self.__lock :
+            n = 0
+            body = ""
+            for (topic, severity), (first, last, count, msg, reasons) in self.__alerts.items() :
+                n += count
+                body += '[{0:s}] {1:s}  x{2:d}  {3:s} - {4:s}\n'.format(severity, topic, count,
+                    time.strftime("%H:%M:%S", time.localtime(first)), time.strftime("%H:%M:%S", time.localtime(last)))
+                if len(reasons) > 1 :
+                    body += "Reasons:\n  " + "\n  ".join(reasons) + "\n"
+                body += msg + "\n\n"
 
-    if MQTT_ENABLED and (MQTT in dest) :
+            self.__alerts.clear()
+            self.digests += 1
+
+        return ('Alert digest (' + str(n) + ' alerts)', body)
+
+# end class AlertDigest
+
+
+alertDigest = AlertDigest()
+
+
+#
+# Destination dispatchers, run on the destination's worker thread
+#
+def dispatchMqtt(records) :
+    for topic, data, hdr, tsec, severity in records :
         if not isinstance(data,str) :
             msg = json.dumps(data)
         else :
             msg = data
         mqttClient.publish(topic, msg)
 
-    if CSV_FILE_ENABLED and (CSV_FILE in dest) :
-        writeCsv(topic, data, hdr)
 
-    if EMAIL_SMS_ENABLED and (EMAIL_SMS in dest) :
+def dispatchCsv(records) :
+    for topic, data, hdr, tsec, severity in records :
+        writeCsv(topic, data, hdr, tsec)
+    csvWriter.flushDue()
+
+
+def dispatchBin(records) :
+    for topic, data, hdr, tsec, severity in records :
+        writeBin(topic, data, hdr, tsec)
+    binWriter.flushDue()
+
+
+def dispatchEmailSms(records) :
+    mails = []
+    for topic, data, hdr, tsec, severity in records :
         if not isinstance(data, str) :
             msg = str(data)
         # if not isinstance(data,str) :
@@ -182,20 +479,125 @@ def pubRecord(dest, topic, data, hdr="") :
 
         upperTopic = topic.upper()
         if 'ALERT' in upperTopic :
-            sendAlert(topic, msg)
+            if ALERT_DIGEST_ENABLED and severity != CRITICAL :
+                alertDigest.add(topic, severity, msg, tsec)
+            else :
+                mails.append(alertMail(topic, msg, tsec))
         elif 'STATUS' in upperTopic :
-            sendStatus(topic, msg)
+            mails.append(statusMail(topic, msg, tsec))
 
-    if INFLUX_DB_ENABLED and (INFLUX_DB in dest) :
+    if alertDigest.due() :
+        mails.append(alertMail(*alertDigest.take()))
+
+    # One SMTP login for the whole batch
+    if mails :
+        sendEmail.send_mails(mails)
+
+
+def emailSmsIdle() :
+    if alertDigest.due() :
+        sendEmail.send_mails([alertMail(*alertDigest.take())])
+    sendEmail.closeIdleSession()
+
+
+def dispatchInfluxDb(records) :
+    for topic, data, hdr, tsec, severity in records :
         if not isinstance(data,str) :
             msg = json.dumps(data)
         else :
             msg = data
         influxClient.write_points(msg)
 
-    if BUZZER_ENABLED and (BUZZER in dest) :
+
+def dispatchBuzzer(records) :
+    for topic, data, hdr, tsec, severity in records :
         buzzerOn(data)
 
+
+dispatchers = {
+    MQTT      : dispatchMqtt,
+    CSV_FILE  : dispatchCsv,
+    BIN_FILE  : dispatchBin,
+    EMAIL_SMS : dispatchEmailSms,
+    INFLUX_DB : dispatchInfluxDb,
+    BUZZER    : dispatchBuzzer
+}
+
+destEnabled = {
+    MQTT      : MQTT_ENABLED,
+    CSV_FILE  : CSV_FILE_ENABLED,
+    BIN_FILE  : BIN_FILE_ENABLED,
+    EMAIL_SMS : EMAIL_SMS_ENABLED,
+    INFLUX_DB : INFLUX_DB_ENABLED,
+    BUZZER    : BUZZER_ENABLED
+}
+
+# Called by a destination's worker when its queue has been idle for a while
+idleHandlers = {
+    CSV_FILE  : lambda : csvWriter.flushDue(),
+    BIN_FILE  : lambda : binWriter.flushDue(),
+    EMAIL_SMS : emailSmsIdle
+}
+
+# (destination, backpressure policy, worker threads)
+sinkConfig = [(dest, policy, 1) for dest, policy in [
+    (MQTT,      COALESCE),
+    (CSV_FILE,  BLOCK),          # local file, keep every record
+    (BIN_FILE,  BLOCK),
+    (EMAIL_SMS, DROP_OLDEST),
+    (INFLUX_DB, DROP_OLDEST),
+    (BUZZER,    COALESCE)] if destEnabled[dest]]
+
+sinkQueues = {}        # destination: SinkQueue, empty until connectPubScribe()
+
+
+#
+# Queue depth and drop counters per destination
+#
+def pubStats() :
+    stats = {}
+    for dest in sinkQueues :
+        q = sinkQueues[dest]
+        stats[dest] = {"Depth": q.depth(), "MaxDepth": q.maxDepth, "Sent": q.sent,
+                       "Dropped": q.dropped, "Coalesced": q.coalesced, "Errors": q.errors}
+    return stats
+
+
+def pubStatsStr() :
+    s = ""
+    for dest, st in pubStats().items() :
+        s += '{0:s}: depth {1:d} (max {2:d}), sent {3:d}, dropped {4:d}, coalesced {5:d}, errors {6:d}\n'.format(
+            dest, st["Depth"], st["MaxDepth"], st["Sent"], st["Dropped"], st["Coalesced"], st["Errors"])
+    return s
+
+
+#
+# Publish data record
+# dest: [MQTT, CSV_FILE, BIN_FILE, EMAIL_SMS, INFLUX_DB]
+# topic: 'topic/subtopic', 'topic/subtopic/alert', or etc.
+# data: dict, list, or str
+#
+# Records are time stamped here and queued, the caller never waits on network I/O.
+# Before connectPubScribe() (or with QUEUE_ENABLED = 0) records are dispatched inline.
+#
+# severity: CRITICAL, WARNING, or INFO, used for EMAIL_SMS alerts
+# tsec: record time in UNIX seconds, default is now
+#
+def pubRecord(dest, topic, data, hdr="", severity=WARNING, tsec=None) :
+    # print("DEST: ", dest, " TOPIC: ", topic, " DATA: ", data, " HDR: ", hdr)
+
+    if tsec is None :
+        tsec = time.time()
+
+    record = (topic, data, hdr, tsec, severity)
+
+    for d in dispatchers :
+        if destEnabled[d] and (d in dest) :
+            if d in sinkQueues :
+                sinkQueues[d].put(record)
+            else :
+                dispatchers[d]([record])
+
     return
 
 
@@ -203,7 +605,7 @@ def pubRecord(dest, topic, data, hdr="") :
 # CSV files
 #
 topicFmtStr = {}       # format string for data records in a topic's csv file
-topicFiles = {}        # Dictionary of csv files that exist
+topicFiles = {}        # Header row of each topic's csv file
 
 #
 # Enables custom format strings per topic when writting csv files
@@ -212,42 +614,296 @@ def addTopicFmtStr(topic, fmtStr) :
     topicFmtStr[topic] = fmtStr
 
 #
-# For new files, create a header row using dict or from hdr
+# Header row for a topic's csv file using dict or from hdr, created on first record
 #
-def addTopicFileHeaders(filename, topic, data, hdr="") :
-    result = ""
-
+def topicHeaderRow(topic, data, hdr="") :
     if not (topic in topicFiles) :
-        topicFiles[topic] = hdr
-        if not os.path.isfile(filename) :
-            # If csv log file does not exist, write header
-            result = 'UNIX time (s),DateTime,'
+        result = 'UNIX time (s),DateTime,'
+
+        if isinstance(data, dict) :
+            # print("dict: ", data)
+            result += ",".join("{}".format(k) for k in data)    # keys
+            # print(result)
+
+        else :
+            # print("Else: ", hdr)
+            result += hdr
+            # print(result)
+
+        topicFiles[topic] = result + '\n'
+
+    return topicFiles[topic]
 
-            if isinstance(data, dict) :
-                # print("dict: ", data)
-                result += ",".join("{}".format(k) for k in data)    # keys
-                # print(result)
 
+#
+# Buffered writer for csv and binary log files.
+#   Files are held open (least recently used closed beyond maxOpen) and lines are
+#   buffered until flushLines lines or flushSecs seconds. The header row is written
+#   whenever a file is opened empty, so it survives deleted or rotated files.
+#   With binary set, lines and header are bytes. Index entries given with a line
+#   are appended to the file's .idx only after the line is written.
+#
+class LogWriter :
+    def __init__(self, maxOpen=CSV_MAX_OPEN_FILES, flushLines=CSV_FLUSH_LINES, flushSecs=CSV_FLUSH_SECS, fsync=CSV_FSYNC, binary=False) :
+        self.maxOpen = maxOpen
+        self.flushLines = flushLines
+        self.flushSecs = flushSecs
+        self.fsync = fsync
+        self.binary = binary
+
+        self.flushes = 0
+        self.opens = 0
+
+        self.__files = collections.OrderedDict()    # filename: open file, in LRU order
+        self.__hdrRows = {}                         # filename: header row
+        self.__lines = {}                           # filename: buffered lines
+        self.__firstLine = {}                       # filename: monotonic time of oldest buffered line
+        self.__pos = {}                             # filename: byte offset of the end of buffered lines
+        self.__index = {}                           # filename: buffered (tsec, offset) index entries
+        self.__lock = threading.RLock()
+
+
+    # Returns the byte offset of line within the file. With indexTime, the line is indexed.
+    def write(self, filename, hdrRow, line, indexTime=None) :
+        with self.__lock :
+            self.__hdrRows[filename] = hdrRow
+
+            if filename in self.__files :
+                self.__files.move_to_end(filename)
             else :
-                # print("Else: ", hdr)
-                result += hdr
-                # print(result)
+                self.__open(filename)
+
+            if filename not in self.__lines :
+                self.__lines[filename] = []
+                self.__firstLine[filename] = time.monotonic()
+
+            offset = self.__pos[filename]
+            self.__pos[filename] += len(line) if self.binary else len(line.encode('utf-8'))
+            self.__lines[filename].append(line)
+            if indexTime is not None :
+                self.__index.setdefault(filename, []).append((indexTime, offset))
+
+            if len(self.__lines[filename]) >= self.flushLines :
+                self.flush(filename)
+
+        return offset
+
+
+    def __open(self, filename) :
+        while len(self.__files) >= self.maxOpen :
+            oldest = next(iter(self.__files))
+            self.flush(oldest)
+            self.__files.pop(oldest).close()
+            self.__pos.pop(oldest, None)
+
+        empty = b"" if self.binary else ""
+        if self.binary :
+            csvFile = open(filename, "ab")
+        else :
+            csvFile = open(filename, "a", encoding='utf-8')
+        self.opens += 1
+        self.__files[filename] = csvFile
+
+        # If csv log file is new or empty, write header
+        if csvFile.tell() == 0 :
+            csvFile.write(self.__hdrRows.get(filename, empty))
+            csvFile.flush()
+        self.__pos[filename] = csvFile.tell()
+
+
+    def flush(self, filename) :
+        with self.__lock :
+            lines = self.__lines.pop(filename, None)
+            index = self.__index.pop(filename, None)
+            self.__firstLine.pop(filename, None)
+
+            if filename not in self.__files :
+                if not lines :
+                    return
+                self.__open(filename)
+
+            csvFile = self.__files[filename]
+            if lines :
+                csvFile.write(lines[0][:0].join(lines))
+            csvFile.flush()
+            if self.fsync :
+                os.fsync(csvFile.fileno())
+            self.flushes += 1
+
+            # Index written after its rows, so a crash cannot leave offsets past the end
+            if index :
+                writeIndex(filename, index)
+
+
+    # Flush files whose oldest buffered line exceeds flushSecs
+    def flushDue(self) :
+        with self.__lock :
+            now = time.monotonic()
+            for filename in [f for f in self.__firstLine if (now - self.__firstLine[f]) >= self.flushSecs] :
+                self.flush(filename)
+
+
+    # Flush and close one file, e.g. a partition that has rotated
+    def closeFile(self, filename) :
+        with self.__lock :
+            self.flush(filename)
+            if filename in self.__files :
+                self.__files.pop(filename).close()
+            self.__pos.pop(filename, None)
+
+
+    def close(self) :
+        with self.__lock :
+            for filename in list(self.__lines) :
+                self.flush(filename)
+            for filename in self.__files :
+                self.__files[filename].close()
+            self.__files.clear()
+            self.__pos.clear()
+
+# end class LogWriter
+
+
+csvWriter = LogWriter()
+atexit.register(csvWriter.close)
+
+
+#
+# Time stamp columns, formatted once per second
+#
+stampCache = [None, ""]
+
+def timeStampCols(tsec) :
+    sec = round(tsec)
+    if stampCache[0] != sec :
+        stampCache[1] = str(sec) + "," + datetime.datetime.fromtimestamp(sec).strftime('%Y-%m-%d %H:%M:%S,')
+        stampCache[0] = sec
+    return stampCache[1]
+
+
+#
+# Log partitions
+#
+partitionFmt = {'day': '_%Y-%m-%d', 'month': '_%Y-%m'}
+partitionRe = re.compile(r'_(\d{4}-\d{2}(?:-\d{2})?)(\.csv|\.bin)(\.gz|\.zst)?$')
+topicPartition = {}    # (topic, ext): current partition filename
+
+
+def logFilename(topic, ext, tsec) :
+    filename = topic.replace('/','_')
+    if LOG_PARTITION :
+        filename += time.strftime(partitionFmt[LOG_PARTITION], time.localtime(tsec))
+    return filename + ext
+
+
+#
+# Filename of the record's partition. When the partition changes, the previous
+# file is closed and, for csv logs, queued for compression. Partitions left over
+# from a previous run are queued on the first record of a topic.
+#
+def rotateLog(topic, ext, tsec, writer) :
+    filename = logFilename(topic, ext, tsec)
+    key = (topic, ext)
+
+    if topicPartition.get(key) != filename :
+        old = topicPartition.get(key)
+        topicPartition[key] = filename
+
+        if old :
+            writer.closeFile(old)
+            indexRows.pop(old, None)
+            if ext == ".csv" :
+                compressLog(old)
+
+        elif LOG_PARTITION and ext == ".csv" :
+            base = topic.replace('/','_')
+            for name in os.listdir(".") :
+                m = partitionRe.search(name)
+                if m and name[:m.start()] == base and name != filename and m.group(2) == ext and not m.group(3) :
+                    compressLog(name)
+
+    return filename
+
+
+#
+# Background compression of closed partitions
+#
+compressQueue = queue.Queue()
+compressThread = None
+
+if LOG_COMPRESS == 'zstd' :
+    try :
+        import zstandard
+    except ImportError :
+        print("zstandard not found, compressing logs with gzip")
+        LOG_COMPRESS = 'gzip'
+
+
+def compressLog(filename) :
+    global compressThread
+
+    if not LOG_COMPRESS :
+        return
 
-            result += '\n'
+    compressQueue.put(filename)
+    if compressThread is None :
+        compressThread = threading.Thread(target=compressWorker, name="pubScribe-compress", daemon=True)
+        compressThread.start()
 
-    return result
+
+#
+# An interrupted compression leaves the partition in place, it is queued again on restart
+#
+def compressWorker() :
+    while True :
+        filename = compressQueue.get()
+
+        try :
+            compressFile(filename)
+        except Exception as e :
+            print("Log compression failed: " + filename + " " + str(e))
+
+
+def compressFile(filename) :
+    if not os.path.isfile(filename) :
+        return
+
+    ext = ".zst" if LOG_COMPRESS == 'zstd' else ".gz"
+    tmpName = filename + ext + ".tmp"
+
+    with open(filename, "rb") as src :
+        if LOG_COMPRESS == 'zstd' :
+            with open(tmpName, "wb") as dst :
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+        else :
+            with open(tmpName, "wb") as raw :
+                with gzip.GzipFile(filename=os.path.basename(filename), mode="wb", fileobj=raw) as dst :
+                    shutil.copyfileobj(src, dst, 1 << 16)
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    # Replace the partition only once the compressed copy is complete
+    os.replace(tmpName, filename + ext)
+    os.remove(filename)
 
 
 #
 # Append data to CSV file
 #
-def writeCsv(topic, data, hdr="") :
-    filename = topic.replace('/','_') + ".csv"
+def writeCsv(topic, data, hdr="", tsec=None) :
+    if tsec is None :
+        tsec = time.time()
+
+    filename = rotateLog(topic, ".csv", tsec, csvWriter)
     # print("Filename: ", filename)
 
-    s = addTopicFileHeaders(filename, topic, data, hdr)
+    hdrRow = topicHeaderRow(topic, data, hdr)
+    if not (filename in csvChecked) :
+        csvCheckFile(filename, hdrRow)
 
-    s += str(round(time.time())) + "," + datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S,')
+    s = timeStampCols(tsec)
 
     if isinstance(data, dict) :
         s += ",".join("{}".format(v) for k, v in data.items())             # values
@@ -263,11 +919,174 @@ def writeCsv(topic, data, hdr="") :
 
     else :
         print("Type not supported")
-   
-    # write interval data to csv file
-    with open(filename, "a") as csvFile :
-        csvFile.write(s + '\n')
-        csvFile.close()
+
+    # buffer interval data for csv file, index written when it is flushed
+    indexTime = tsec if CSV_INDEX_ENABLED and indexDue(filename) else None
+    csvWriter.write(filename, hdrRow, s + '\n', indexTime)
+
+
+#
+# Header row of an existing csv file must match the topic's columns, otherwise the
+#   file (and its index) is moved aside and a new file started, as for binary files.
+#
+csvChecked = {}        # csv files checked this session
+
+def csvCheckFile(filename, hdrRow) :
+    csvChecked[filename] = 1
+    trimIndex(filename)
+
+    if not os.path.isfile(filename) or not os.path.getsize(filename) :
+        return
+
+    with open(filename, "r", encoding='utf-8', errors='replace') as csvFile :
+        oldHdr = csvFile.readline()
+
+    if oldHdr != hdrRow :
+        csvWriter.closeFile(filename)
+        old = filename[:-4] + time.strftime(".%Y%m%d%H%M%S.old.csv")
+        os.rename(filename, old)
+        if os.path.isfile(filename + ".idx") :
+            os.rename(filename + ".idx", old + ".idx")
+        print("CSV log columns changed, moved old file aside: " + filename)
+
+
+#
+# Sparse time index for csv files, int64 pairs (UNIX seconds, byte offset of row).
+#   The first row written to a file by this run is always indexed. Entries are
+#   written by LogWriter.flush() once their rows are in the file.
+#
+INDEX_RECORD = struct.Struct('<qq')
+indexRows = {}         # filename: rows written this run
+
+
+# True when the next row written to filename is to be indexed
+def indexDue(filename) :
+    n = indexRows.get(filename, 0)
+    indexRows[filename] = n + 1
+    return n % CSV_INDEX_ROWS == 0
+
+
+def writeIndex(filename, entries) :
+    with open(filename + ".idx", "ab") as idxFile :
+        idxFile.write(b"".join(INDEX_RECORD.pack(int(round(tsec)), offset) for tsec, offset in entries))
+
+
+#
+# Drop index entries at or past the end of the csv file, left by a run that
+#   stopped before its buffered rows were written
+#
+def trimIndex(filename) :
+    idxName = filename + ".idx"
+    if not os.path.isfile(idxName) :
+        return
+
+    size = os.path.getsize(filename) if os.path.isfile(filename) else 0
+    with open(idxName, "rb") as idxFile :
+        data = idxFile.read()
+
+    n = 0
+    while n + INDEX_RECORD.size <= len(data) and INDEX_RECORD.unpack_from(data, n)[1] < size :
+        n += INDEX_RECORD.size
+
+    if n < len(data) :
+        with open(idxName, "r+b") as idxFile :
+            idxFile.truncate(n)
+        print("CSV index entries past end of file dropped: " + idxName)
+
+
+#
+# Binary log files
+#   Header: BIN_MAGIC, uint32 schema length, JSON schema padded to 8 bytes
+#           {"topic": topic, "columns": [...], "record": "<q4f..."}
+#   Records: int64 UNIX time in milliseconds followed by one float32 per column,
+#            little endian with no padding. Values that are not numbers are NaN.
+#
+BIN_MAGIC = b'RMBIN001'
+
+binWriter = LogWriter(binary=True)
+atexit.register(binWriter.close)
+
+topicBinSchema = {}    # topic: (header bytes, struct.Struct)
+binChecked = {}        # binary files checked this session
+
+
+def topicBinHeader(topic, data, hdr="") :
+    if not (topic in topicBinSchema) :
+        if isinstance(data, dict) :
+            columns = [str(k) for k in data]
+        elif hdr :
+            columns = hdr.split(',')
+        else :
+            columns = ['Col' + str(i+1) for i in range(len(binValues(data)))]
+
+        rec = struct.Struct('<q' + 'f'*len(columns))
+        schema = json.dumps({"topic": topic, "columns": columns, "record": rec.format}).encode('utf-8')
+        schema += b' ' * (-(len(BIN_MAGIC) + 4 + len(schema)) % 8)
+
+        topicBinSchema[topic] = (BIN_MAGIC + struct.pack('<I', len(schema)) + schema, rec)
+
+    return topicBinSchema[topic]
+
+
+def binValues(data) :
+    if isinstance(data, dict) :
+        items = list(data.values())
+    elif isinstance(data, list) :
+        items = data
+    else :
+        items = str(data).split(',')
+
+    values = []
+    for v in items :
+        try :
+            values.append(float(v))
+        except (TypeError, ValueError) :
+            values.append(math.nan)
+    return values
+
+
+#
+# Before first append, drop a partial trailing record (power loss) and move aside
+# a file written with a different schema so records stay aligned.
+#
+def binCheckFile(filename, hdrBytes, rec) :
+    binChecked[filename] = 1
+
+    if not os.path.isfile(filename) :
+        return
+
+    size = os.path.getsize(filename)
+    with open(filename, "rb") as binFile :
+        oldHdr = binFile.read(len(hdrBytes))
+
+    if size and oldHdr != hdrBytes :
+        os.rename(filename, filename[:-4] + time.strftime(".%Y%m%d%H%M%S.old.bin"))
+        print("Binary log schema changed, moved old file aside: " + filename)
+
+    elif size > len(hdrBytes) and (size - len(hdrBytes)) % rec.size :
+        with open(filename, "r+b") as binFile :
+            binFile.truncate(size - (size - len(hdrBytes)) % rec.size)
+
+
+#
+# Append data to binary file
+#
+def writeBin(topic, data, hdr="", tsec=None) :
+    if tsec is None :
+        tsec = time.time()
+
+    filename = rotateLog(topic, ".bin", tsec, binWriter)
+
+    hdrBytes, rec = topicBinHeader(topic, data, hdr)
+    if not (filename in binChecked) :
+        binCheckFile(filename, hdrBytes, rec)
+
+    # Fit values to the schema of the file
+    nCols = (rec.size - 8) // 4
+    values = binValues(data)[:nCols]
+    values += [math.nan] * (nCols - len(values))
+
+    binWriter.write(filename, hdrBytes, rec.pack(int(round(tsec*1000)), *values))
 
 
 
@@ -275,20 +1094,28 @@ def writeCsv(topic, data, hdr="") :
 # EMAIL SMS
 #
 
+def alertMail(subj, msg, tsec=None) :
+    msg = time.strftime("%a, %d %b %Y %H:%M:%S \n", time.localtime(tsec)) + msg
+    return (sendEmail.ALERT_USERID, subj, msg)
+
+
+def statusMail(subj, msg, tsec=None) :
+    msg = time.strftime("%a, %d %b %Y %H:%M:%S \n", time.localtime(tsec)) + msg
+    return (sendEmail.STATUS_USERID, subj, msg)
+
+
 #
 # Send alert via email to another email or as SMS text
 #
-def sendAlert(subj, msg) :
-    msg = time.strftime("%a, %d %b %Y %H:%M:%S \n", time.localtime()) + msg
-    sendEmail.send_mail(sendEmail.ALERT_USERID, subj, msg)
+def sendAlert(subj, msg, tsec=None) :
+    sendEmail.send_mail(*alertMail(subj, msg, tsec))
 
 
 #
 # Send status via email to another email or as SMS text
 #
-def sendStatus(subj, msg) :
-    msg = time.strftime("%a, %d %b %Y %H:%M:%S \n", time.localtime()) + msg
-    sendEmail.send_mail(sendEmail.STATUS_USERID, subj, msg)
+def sendStatus(subj, msg, tsec=None) :
+    sendEmail.send_mail(*statusMail(subj, msg, tsec))
 
 
 #
@@ -340,6 +1167,9 @@ if __name__ == '__main__':
     sVar = '6.4, 3.2, 4.5, 0.95'
     pubRecord(CSV_FILE, topic, sVar, "Col1,Col2,Col3,Col4")
 
+    if BIN_FILE_ENABLED :
+        pubRecord([CSV_FILE, BIN_FILE], topic, listVar, "Col1,Col2,Col3,Col4")
+
     # Test buzzer
     if BUZZER_ENABLED :
         pubRecord(BUZZER, "", {'Frequency': 500, 'Dutycycle': 20, 'Duration': 20})
@@ -351,4 +1181,5 @@ if __name__ == '__main__':
         pubRecord(BUZZER, "", {'Frequency': 900, 'Dutycycle': 30, 'Duration': 40})
         time.sleep(60)
 
+    print(pubStatsStr())
     disconnectPubScribe()
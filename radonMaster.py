@@ -13,6 +13,40 @@ REVISION HISTORY
   2021/04/01  BrucesHobbies   Changed wavePlus alert message format
   2021/04/14  BrucesHobbies   Added support for variable tone buzzer
                               Added high pressure alert
+  2026/10/17  BrucesHobbies   Replaced per tick Timer chain with tickScheduler
+                              Added pubScribe queue counters to status message
+                              Vacuum loss alerts are CRITICAL, others digested
+                              Averages also published to BIN_FILE
+                              Hourly and daily rollups of averaged vacuum
+                              Window std, min, max, and read counts logged
+                              Alert on sensor read failures
+                              Baseline and alert times checkpointed to
+                              radonMasterState.json, restored at start
+                              Baseline tracks slow changes (EWMA), frozen
+                              during alerts, and is logged with the average
+                              Fast (dead fan) and drift alert windows
+                              CUSUM step change alert on each reading
+                              Optional high rate raw capture, dumped on
+                              alerts and on SIGUSR1
+                              Black box snapshot of readings around alerts
+                              Optional per second log for radonMasterSpectrum
+                              Readings decoded straight to vacuum in.wc
+                              WavePlus read interval set by airthingsInterval
+                              WavePlus found by a background scan after
+                              sampling has started, address cached on disk
+                              WavePlus read on the wave worker thread, results
+                              collected each tick, never blocking sampling
+                              Status lists the last reading of each WavePlus
+                              Several pressure sensors (sensorConfig) on I2C
+                              channels, addresses, and SPI chip selects, each
+                              a VacuumChannel with its own baseline, alert
+                              settings and state, log topics, all read each tick
+                              Step alerts measured from a reference following
+                              the last hour, they no longer freeze the baseline
+                              Alerts throttled per window (fast, average, drift,
+                              step), a step alert never holds back a CRITICAL
+                              WavePlus alerts on RadonMaster/Alert/WavePlus/<device>
+                              Vacuum alerts on RadonMaster/Alert/<channel name>
 
 OVERVIEW:
     RadonMaster(TM) is a system to montior a radon mitigation fan
@@ -48,31 +82,59 @@ import sys
 import os
 import time
 import datetime
-from threading import Timer
 import math
 import subprocess
+import json
+import signal
 
 # RadonMaster imports
 import sensorHnyAbp
 import pubScribe
+import tickScheduler
+import rollup
+import streamStats
+import changeDetect
+import blackBox
 
 #
 AIRTHINGS = 0      # Default = 0, which is monitoring and logging disabled
 if AIRTHINGS :
     import wave    # Added 12/4/2020
 
+airthingsInterval = 15*60    # seconds between WavePlus reads, 60 - 3600, link kept open between reads
+
 #
 # --- User pressure/vacuum sensor configuration parameters ---
 #
-# abp = sensorHnyAbp.SensorHnyAbp("001PDS")    # -1 to +1 psi diff SPI often found in DIP package
-# abp = sensorHnyAbp.SensorHnyAbp("001PG2")    # -1 to +1 psi diff I2C
-abp = sensorHnyAbp.SensorHnyAbp("060MG2")    # 0 to 60 mbar gage I2C but often found in surface mount package
+# One entry per sensor, all read each tInterval:
+#   "name"   - used in messages and log topics, the first sensor logs to RadonMaster/PresSensor,
+#              the others to RadonMaster/PresSensor/<name>
+#   "sensor" - ABP part code, the last character is the I2C address (2 = 0x28, 3 = 0x38, ...) or S for SPI
+#   "i2c"    - I2C channel, default 1      "spi" - SPI chip select 0 or 1 on SPI bus 0, default 0
+#   Optional alert settings for this sensor instead of the ones below: "pDeltaLowSide", "pDeltaHighSide",
+#   "pLowPressAlert", "pHighPressAlert", "fastDeltaLow", "driftDeltaLow", "driftDeltaHigh"
+#
+#   {"name": "Fan", "sensor": "001PDS"},                  # -1 to +1 psi diff SPI often found in DIP package
+#   {"name": "Fan", "sensor": "001PG2"},                  # -1 to +1 psi diff I2C
+#   {"name": "SubSlab", "sensor": "060MG3", "i2c": 0, "pLowPressAlert": 0.1},    # second fan or sub-slab point
+sensorConfig = [
+    {"name": "Fan", "sensor": "060MG2"},    # 0 to 60 mbar gage I2C but often found in surface mount package
+    ]
 
 tInterval = 1	       # time interval in seconds between fan vacuum measurements (default: 1, 
                        #     possible values: 1, 2, 3, 4, 5, 6, 10, 15, 20, and 30).
 
+# High rate raw capture: sensor polled in a background thread, each measurement is the
+#   average of the readings in its tInterval. The last captureSeconds of raw readings
+#   are written to RadonMaster_AbpRaw_*.bin on each alert sent and on "kill -USR1 pid".
+captureEnabled = 0       # 1 enables
+captureRate = 200        # readings per second, I2C up to a few hundred, SPI up to about 1000
+captureSeconds = 60      # seconds of raw readings kept in memory
+
 # Wind gusts
 tAverage = 60          # averaging time in measurements, recommend multiple measurements due to wind gusts
+secondLogEnabled = 0   # 1 logs every measurement to RadonMaster_PresSensorSec (BIN_FILE, enable in pubScribe.py)
+                       #     for gust analysis with radonMasterSpectrum.py, about 1 MB per day
 
 # --- Fan speed alert settings ---
 # Be sure and account for variations for wind gust effects on vent opening
@@ -80,6 +142,26 @@ pDeltaLowSide  = 0.4    # delta inches water column
 pDeltaHighSide = 0.4    # delta inches water column
 pLowPressAlert = 0.5    # Absolute value in case auto calibration is off      
 pHighPressAlert = 5.0    # Absolute value in case auto calibration is off      
+readFailAlert = 0.1      # Fraction of failed sensor reads in an averaging window
+
+# Fast window: every reading in the window below the limits is a dead fan, alerted in seconds
+fastWindow = 5           # seconds, sliding each reading
+fastDeltaLow = 0.8       # delta inches water column below baseline
+
+# Drift window: average of a long window compared with tighter limits, gusts average out
+driftWindow = 15*60      # seconds, sliding each minute
+driftDeltaLow = 0.2      # delta inches water column
+driftDeltaHigh = 0.2     # delta inches water column
+
+# Step change detector (two sided CUSUM) on each reading, in units of the reading noise (std)
+cusumEnabled = 1
+cusumSlack = 1.0         # std, steps smaller than this are ignored
+cusumThreshold = 30.0    # larger is fewer false alerts and slower detection
+cusumRefTimeConst = 60   # averages (minutes), steps are measured from a reference following the
+                         #     averages this fast, slow drift is left to the baseline and drift window
+
+# Baseline tracking of slow seasonal changes (stack effect, soil moisture) after calibration
+baselineTimeConst = 7*24*60    # Time constant in averages (minutes), 0 = baseline fixed after calibration
 
 #
 #--- User Email Alerts Configuration ---
@@ -102,6 +184,16 @@ statusDOW      = 0              # Day of week if interval and DOM are not used (
 
 minIntervalBtwAlerts = 3600     # Wait this long before sending another email - seconds
 
+blackBoxPreMinutes = 10         # Readings before an alert saved to RadonMaster_BlackBox_*.csv.gz, 0 disables
+blackBoxPostMinutes = 5         # Readings after an alert in the same file
+
+#
+# --- Saved state for warm restarts ---
+#
+STATE_FILE = "radonMasterState.json"    # Calibrated baseline and alert times, "" disables
+stateSaveInterval = 600         # Seconds between checkpoints, also saved on alerts and exit
+stateMaxAge = 7*86400           # Older saved baselines are ignored and calibration is run
+
 # End of user configuration
 
 
@@ -148,21 +240,81 @@ def paramCheck() :
         print("Error (tAverage): Measurement averaging should be in range of 10 - 300 measurements.")
         sys.exit(" Exit")
 
-    # Alert levels in inches of water column
-    if (pDeltaLowSide < 0.1) or (pDeltaLowSide > 1.0) :
-        print("Error (pDeltaLowSide): Vacuum delta should be in range of 0.1 - 1.0 inches of water column.")
+    # Sensors, each on its own bus address or chip select
+    if not channels :
+        print("Error (sensorConfig): At least one pressure sensor is required.")
+        sys.exit(" Exit")
+
+    names = set()
+    buses = set()
+    for ch in channels :
+        bus = (ch.i2c, ch.abp.i2c_address) if ch.abp.i2c_address else ("SPI", ch.spi)
+        if (ch.name in names) or (bus in buses) or (ch.i2c not in [0, 1]) or (ch.spi not in [0, 1]) :
+            print("Error (sensorConfig): " + ch.name + ": names and bus addresses should be unique, i2c channel and spi chip select 0 or 1.")
+            sys.exit(" Exit")
+        names.add(ch.name)
+        buses.add(bus)
+
+    # Alert levels in inches of water column, the defaults or each sensor's own
+    for ch in channels :
+        if (ch.pDeltaLowSide < 0.1) or (ch.pDeltaLowSide > 1.0) :
+            print("Error (pDeltaLowSide): " + ch.label() + "Vacuum delta should be in range of 0.1 - 1.0 inches of water column.")
+            sys.exit(" Exit")
+
+        if (ch.pDeltaHighSide < 0.1) or (ch.pDeltaHighSide > 1.0) :
+            print("Error (pDeltaHighSide): " + ch.label() + "Vacuum delta should be in range of 0.1 - 1.0 inches of water column.")
+            sys.exit(" Exit")
+
+        if (ch.pLowPressAlert < 0.1) or (ch.pLowPressAlert > ch.pHighPressAlert ) :
+            print("Error (pLowPressAlert): " + ch.label() + "Minimum vacuum should be in range of 0.1 - pHighPressAlert inches of water column.")
+            sys.exit(" Exit")
+
+        if (ch.pHighPressAlert > 10.0) :
+            print("Error (pHighPressAlert): " + ch.label() + "Maximum vacuum should be less than 10.0 inches of water column.")
+            sys.exit(" Exit")
+
+        if (ch.fastDeltaLow < ch.pDeltaLowSide) :
+            print("Error (fastDeltaLow): " + ch.label() + "Fast window delta should be at least pDeltaLowSide.")
+            sys.exit(" Exit")
+
+        if (ch.driftDeltaLow > ch.pDeltaLowSide) or (ch.driftDeltaHigh > ch.pDeltaHighSide) :
+            print("Error (driftDeltaLow, driftDeltaHigh): " + ch.label() + "Drift deltas should not exceed pDeltaLowSide and pDeltaHighSide.")
+            sys.exit(" Exit")
+
+    if (readFailAlert <= 0.0) or (readFailAlert >= 1.0) :
+        print("Error (readFailAlert): Fraction of failed reads should be in range of 0.0 - 1.0.")
+        sys.exit(" Exit")
+
+    if (airthingsInterval < 60) or (airthingsInterval > 3600) or (3600 % airthingsInterval) :
+        print("Error (airthingsInterval): WavePlus read interval should divide an hour, in range of 60 - 3600 seconds.")
         sys.exit(" Exit")
 
-    if (pDeltaHighSide < 0.1) or (pDeltaHighSide > 1.0) :
-        print("Error (pDeltaHighSide): Vacuum delta should be in range of 0.1 - 1.0 inches of water column.")
+    if (fastWindow < 2*tInterval) or (fastWindow > 60) :
+        print("Error (fastWindow): Fast window should be in range of 2 readings - 60 seconds.")
         sys.exit(" Exit")
 
-    if (pLowPressAlert < 0.1) or (pLowPressAlert > pHighPressAlert ) :
-        print("Error (pLowPressAlert): Minimum vacuum should be in range of 0.1 - pHighPressAlert inches of water column.")
+    if (driftWindow % 60) or (driftWindow < 300) or (driftWindow > 3600) :
+        print("Error (driftWindow): Drift window should be whole minutes in range of 300 - 3600 seconds.")
         sys.exit(" Exit")
 
-    if (pHighPressAlert > 10.0) :
-        print("Error (pHighPressAlert): Maximum vacuum should be less than 10.0 inches of water column.")
+    if (cusumSlack < 0.25) or (cusumThreshold < 5.0) :
+        print("Error (cusumSlack, cusumThreshold): Step detector slack should be at least 0.25 and threshold at least 5.")
+        sys.exit(" Exit")
+
+    if (cusumRefTimeConst < 10) or (cusumRefTimeConst > 1440) :
+        print("Error (cusumRefTimeConst): Step reference time constant should be in range of 10 - 1440 averages.")
+        sys.exit(" Exit")
+
+    if captureEnabled and ((captureRate < 2) or (captureRate > 2000) or (captureSeconds < 1) or (captureSeconds > 3600)) :
+        print("Error (captureRate, captureSeconds): Capture rate should be 2 - 2000 per second for 1 - 3600 seconds.")
+        sys.exit(" Exit")
+
+    if (blackBoxPreMinutes < 0) or (blackBoxPostMinutes < 0) or (blackBoxPreMinutes + blackBoxPostMinutes > 120) :
+        print("Error (blackBoxPreMinutes, blackBoxPostMinutes): Black box should hold 0 - 120 minutes.")
+        sys.exit(" Exit")
+
+    if (baselineTimeConst < 0) or (0 < baselineTimeConst < 60) :
+        print("Error (baselineTimeConst): Baseline time constant should be 0 (fixed) or at least 60 averages.")
         sys.exit(" Exit")
 
 # end paramCheck()
@@ -171,17 +323,19 @@ def paramCheck() :
 #
 #--- Global Variables: program use only ---
 #
-count = 0                            # Count of reads in window of time
-lastReadTime = 0                     # Seconds since epoch
-sensorSum = 0                        # summation of sensor readings used to form average over interval
 
-pFiltered = 0                        # Filtered readings
-calCount = 30                        # Number of averaged readings to form long term average
-calLength = calCount
+# Alert windows over the same readings
+FAST_WINDOW = "fast"
+AVG_WINDOW = "avg"
+DRIFT_WINDOW = "drift"
+STEP_DETECT = "step"
 
-statusIntervalCntDn = 0
-lastStatusTime = 0                   # Last time status was sent
-lastAlertTime = 0                    # Last time an alert
+MIN_SIGMA = 0.01                     # inches water column, floor for a very quiet sensor
+lastReadTime = 0                     # Seconds since epoch
+
+# Alert settings a sensor entry in sensorConfig may set for itself
+CHANNEL_SETTINGS = ("pDeltaLowSide", "pDeltaHighSide", "pLowPressAlert", "pHighPressAlert",
+                    "fastDeltaLow", "driftDeltaLow", "driftDeltaHigh")
 
 
 #
@@ -212,123 +366,465 @@ def formatLocalTime() :
 
 
 #
-# Calibration algorithm and alert check
+# One pressure sensor and everything monitored for it: calibration baseline,
+#   averaging and alert windows, step detector, rollups, black box, raw capture,
+#   and alert throttling. The first sensor keeps the original log topics and file
+#   names, the others add their name.
 #
-def radonAlg(sensorAvg) :
-    global pFiltered, calCount
+class VacuumChannel :
+    def __init__(self, cfg, index) :
+        self.name = cfg["name"]
+        self.index = index
+        self.i2c = cfg.get("i2c", 1)
+        self.spi = cfg.get("spi", 0)
+        self.abp = sensorHnyAbp.SensorHnyAbp(cfg["sensor"], i2cChannel=self.i2c, spiDevice=self.spi)
+
+        # Alert settings, sensorConfig entry or the defaults above
+        for setting in CHANNEL_SETTINGS :
+            setattr(self, setting, cfg.get(setting, globals()[setting]))
+
+        suffix = "/" + self.name if index else ""
+        fileSuffix = "_" + self.name if index else ""
+        self.topic = "RadonMaster/PresSensor" + suffix
+        self.secTopic = "RadonMaster/PresSensorSec" + suffix
 
-    s = "Program logic fault"
+        self.pressStats = streamStats.WindowStats()    # mean, std, min, max, and read counts over interval
+        self.fastStats = streamStats.SlidingWindow(fastWindow, tInterval)
+        self.driftStats = streamStats.SlidingWindow(driftWindow, 60)
+        self.windowAlerts = {FAST_WINDOW: "", AVG_WINDOW: "", DRIFT_WINDOW: "", STEP_DETECT: ""}    # active alert per window
+
+        self.stepDetector = changeDetect.Cusum(cusumSlack, cusumThreshold)
+        self.stepRef = None              # level steps are measured from, baseline until the first average
+        self.recorder = blackBox.BlackBox(blackBoxPreMinutes*60, blackBoxPostMinutes*60, tInterval,
+                                          "RadonMaster_BlackBox" + fileSuffix) if blackBoxPreMinutes else None
+        self.rawPrefix = "RadonMaster_AbpRaw" + fileSuffix
+        self.capture = None
+        self.readSigma = 0               # Reading noise (std), smoothed over averaging windows
+
+        self.pFiltered = 0               # Filtered readings
+        self.calCount = 30               # Number of averaged readings to form long term average
+        self.calLength = self.calCount
+
+        self.pressRollups = rollup.Rollups(self.topic)    # hourly and daily vacuum rollups
+
+        self.lastAlertTimes = {window: 0 for window in self.windowAlerts}    # Last alert time per window
+        self.lastPressMsg = ""
+
+
+    # Sensor name in messages when there is more than one
+    def label(self) :
+        return self.name + " " if len(channels) > 1 else ""
+
+
+    def sensorType(self) :
+        return [self.abp.PRESSURE_MIN, self.abp.PRESSURE_MAX, self.abp.PRES_UNITS]
+
+
+    def startCapture(self) :
+        self.capture = sensorHnyAbp.AbpCapture(self.abp, captureRate, captureSeconds, self.rawPrefix)
+        self.capture.start()
+
+
+    # Vacuum in.wc, average of the raw readings since the last tick when capturing
+    def read(self) :
+        return self.capture.readVacuumStatus() if self.capture else self.abp.readVacuumStatus()
+
+
+    #
+    # Calibration algorithm and alert check
+    #
+    #   stats is the window's streamStats.WindowStats, used for the sensor read failure check
+    #   window selects the thresholds: FAST_WINDOW, AVG_WINDOW (logged average), or DRIFT_WINDOW
+    #   Returns (message, severity), loss of vacuum is CRITICAL and bypasses the alert digest
+    #
+    #   After calibration the baseline follows the averages with an exponentially weighted
+    #   moving average, time constant baselineTimeConst. It is frozen while any alert is
+    #   active so a failing fan is never learned as the new normal. The absolute limits
+    #   pLowPressAlert and pHighPressAlert still catch a decline slower than the baseline.
+    #
+    def radonAlg(self, sensorAvg, stats=None, window=AVG_WINDOW) :
+        s = "Program logic fault"
+        severity = pubScribe.WARNING
+
+        if window == FAST_WINDOW :
+            s = ""
+            if not self.calCount and stats.nValid >= 0.8 * fastWindow / tInterval :
+                if (stats.max < (self.pFiltered-self.fastDeltaLow)) or (stats.max < self.pLowPressAlert and stats.min > -self.pLowPressAlert) :
+                    s = "Alert: vacuum lost, all readings for {0:d} s below limit.".format(fastWindow)
+                    severity = pubScribe.CRITICAL
+
+        elif window == DRIFT_WINDOW :
+            s = ""
+            if not self.calCount and stats.nValid >= 0.8 * driftWindow / tInterval :
+                if (sensorAvg < (self.pFiltered-self.driftDeltaLow)) :
+                    s = "Alert: vacuum drift low ({0:d} min average).".format(driftWindow // 60)
+                elif (sensorAvg > (self.pFiltered+self.driftDeltaHigh)) :
+                    s = "Alert: vacuum drift high ({0:d} min average).".format(driftWindow // 60)
+
+        elif self.calCount :
+            self.pFiltered = self.pFiltered + sensorAvg / self.calLength
+            self.calCount = self.calCount - 1
+            if self.calCount :
+                s = "Cal in process " + str(self.calCount)
+            else :
+                s = "Cal completed"
 
-    if calCount :
-        pFiltered = pFiltered + sensorAvg / calLength
-        calCount = calCount - 1
-        if calCount :
-            s = "Cal in process " + str(calCount)
         else :
-            s = "Cal completed"
-
-    else :
-        if (sensorAvg < (pFiltered-pDeltaLowSide)) or (sensorAvg > (pFiltered+pDeltaLowSide)) :
-            s = "Alert: vacuum delta."
-        elif (abs(sensorAvg) < pLowPressAlert) :
-            s = "Alert: vacuum less than low limit (pLowPressAlert)."
-        elif (abs(sensorAvg) > pHighPressAlert) :
-            s = "Alert: vacuum greater than high limit (pHighPressAlert)."
+            if (sensorAvg < (self.pFiltered-self.pDeltaLowSide)) :
+                s = "Alert: vacuum delta low."
+                severity = pubScribe.CRITICAL
+            elif (sensorAvg > (self.pFiltered+self.pDeltaHighSide)) :
+                s = "Alert: vacuum delta high."
+            elif (abs(sensorAvg) < self.pLowPressAlert) :
+                s = "Alert: vacuum less than low limit (pLowPressAlert)."
+                severity = pubScribe.CRITICAL
+            elif (abs(sensorAvg) > self.pHighPressAlert) :
+                s = "Alert: vacuum greater than high limit (pHighPressAlert)."
+            elif stats and (stats.failRate() > readFailAlert) :
+                s = "Alert: pressure sensor read failures {0:d} of {1:d}.".format(stats.nFail, stats.nFail + stats.nValid)
+            else :
+                s = ""    # Nominal: no alert
+
+            if self.stepRef is not None :
+                self.stepRef = self.stepRef + (sensorAvg - self.stepRef) / cusumRefTimeConst
+
+            # A step alert does not freeze the baseline, it clears once the step reference adapts
+            if baselineTimeConst and s == "" and not any(a for w, a in self.windowAlerts.items() if w != STEP_DETECT) :
+                self.pFiltered = self.pFiltered + (sensorAvg - self.pFiltered) / baselineTimeConst
+
+        if s[:3] != "Cal" :
+            self.windowAlerts[window] = s
+
+        return s, severity
+
+
+    #
+    # Step change check of one reading against the step reference.
+    #   Returns (message, severity), the message stays set while the step is detected.
+    #   The reference follows the averages with time constant cusumRefTimeConst, so a
+    #   step is alerted once and the alarm clears as the reference reaches the new level,
+    #   and a drift slower than the reference never builds up to a step alarm.
+    #
+    def radonAlgStep(self, vacuum) :
+        s = ""
+        if not self.calCount and self.readSigma :
+            if self.stepRef is None :
+                self.stepRef = self.pFiltered
+            state = self.stepDetector.update(vacuum, self.stepRef, max(self.readSigma, MIN_SIGMA))
+            if state == changeDetect.STEP_DOWN :
+                s = "Alert: vacuum step change down."
+            elif state == changeDetect.STEP_UP :
+                s = "Alert: vacuum step change up."
+
+        self.windowAlerts[STEP_DETECT] = s
+        return s, pubScribe.WARNING
+
+
+    #
+    # Send a vacuum alert, at most one every minIntervalBtwAlerts for each of this sensor's
+    #   windows, so an alert from one window never holds back another (e.g. a dead fan's
+    #   fast window alert after a drift alert)
+    #
+    def pressAlert(self, alertMsg, severity, window=AVG_WINDOW) :
+        # Snapshot and raw dump with each alert sent (or that would be sent when disabled)
+        tsec = time.time()
+        if ((tsec-self.lastAlertTimes[window]) > minIntervalBtwAlerts) :
+            self.lastAlertTimes[window] = tsec
+            if self.recorder :
+                snapshot = self.recorder.trigger(alertMsg.split("\n")[1], lastTickWall)
+                alertMsg = alertMsg + "\nSnapshot: " + snapshot + " (written after " + str(blackBoxPostMinutes) + " min)"
+            if self.capture :
+                alertMsg = alertMsg + "\nRaw readings: " + self.dumpCapture()
+
+            if pressAlertsEnabled :
+                topic = "RadonMaster/Alert/" + self.name
+                pubScribe.pubRecord(pubScribe.EMAIL_SMS, topic, alertMsg, severity=severity)
+            saveState()
+
+            # pubScribe.pubRecord(pubScribe.BUZZER, 'Buzzer', {'Frequency': 700, 'Dutycycle': 10, 'Duration': 10})
+
+        if not pressAlertsEnabled :
+            print(alertMsg)
+
+
+    #
+    # Write the raw capture ring buffer, returns the filename
+    #
+    def dumpCapture(self) :
+        try :
+            filename = self.capture.dump()
+            print("Raw readings written to " + filename)
+        except OSError as e :
+            filename = "not written, " + str(e)
+        return filename
+
+
+    def vacuumMsg(self, vacuum) :
+        return '{0:s} {1:s}Vacuum: {2:7.2f} in.wc'.format(formatLocalTime(), self.label(), round(vacuum, 2))
+
+
+    #
+    # One reading: windows, step detector, and on the minute the logged average
+    #
+    def process(self, tWall, status, vacuum, minuteCrossed) :
+        if self.recorder :
+            self.recorder.add(tWall, vacuum if status == 0 else None)
+
+        if status == 0 : 
+            self.pressStats.add(vacuum)
+            if secondLogEnabled :
+                pubScribe.pubRecord(pubScribe.BIN_FILE, self.secTopic, [round(vacuum, 4)], "Inches w.c.", tsec=tWall)
+            fast = self.fastStats.add(vacuum, tWall)
+            drift = self.driftStats.add(vacuum, tWall)
         else :
-            s = ""    # Nominal: no alert
+            self.pressStats.fail()
+            fast = self.fastStats.fail(tWall)
+            drift = self.driftStats.fail(tWall)
+
+        # Fast and drift windows, evaluated as each step closes, alert when an alert starts
+        for window, stats in ((FAST_WINDOW, fast), (DRIFT_WINDOW, drift)) :
+            if stats is None :
+                continue
+
+            prevAlg = self.windowAlerts[window]
+            sAlg, severity = self.radonAlg(stats.mean, stats, window)
+            if sAlg and sAlg != prevAlg :
+                sWindow = self.vacuumMsg(stats.mean)
+                print(sWindow + " " + sAlg)
+                self.pressAlert("Alert " + sWindow + "\n" + sAlg + "\nWindow " + str(stats), severity, window)
+
+        # Step change on each reading, alert when a step is first detected
+        if cusumEnabled and status == 0 :
+            prevAlg = self.windowAlerts[STEP_DETECT]
+            sAlg, severity = self.radonAlgStep(vacuum)
+            if sAlg and sAlg != prevAlg :
+                sStep = self.vacuumMsg(vacuum)
+                print(sStep + " " + sAlg)
+                self.pressAlert("Alert " + sStep + "\n" + sAlg + '\nBaseline {0:.2f} in.wc, step reference {1:.2f} in.wc, reading std {2:.3f}'.format(
+                    self.pFiltered, self.stepRef, self.readSigma), severity, STEP_DETECT)
+
+        # Calculate average vacuum over interval, log data, and check for alert conditions
+        if (self.pressStats.nValid>=(tAverage*0.8) and minuteCrossed) :
+            sensorAvg = self.pressStats.mean
+            baseline = round(self.pFiltered, 3) if not self.calCount else math.nan    # baseline the average is checked against
+
+            sAlg, severity = self.radonAlg(sensorAvg, self.pressStats)
+
+            # Append interval data to CSV file: average, std, min, max, valid reads, failed reads, baseline
+            pubScribe.pubRecord([pubScribe.CSV_FILE, pubScribe.BIN_FILE], self.topic, self.pressStats.values() + [baseline], streamStats.HDR + ",Baseline")
+            """ MS-Excel UNIX seconds to date and time
+            date from seconds : =FLOOR(A2/86400,1)+DATE(1970,1,1)
+            HH:MM from seconds: =MOD(A2,86400)/86400
+            """
+            self.pressRollups.add(sensorAvg, tWall)
+
+            self.lastPressMsg = self.vacuumMsg(sensorAvg)
+            print(self.lastPressMsg + " " + sAlg)
+
+            # Reading noise for the step detector
+            if self.pressStats.nValid > 1 :
+                self.readSigma = self.readSigma + (self.pressStats.std() - self.readSigma) / 10 if self.readSigma else self.pressStats.std()
+
+            windowMsg = "Window " + str(self.pressStats)
+            self.pressStats.reset()
+
+            if sAlg == "Cal completed" :
+                saveState()
+
+            if not( sAlg=="" or sAlg[:3]=="Cal" ) :
+                self.pressAlert("Alert " + self.lastPressMsg + "\n" + sAlg + "\n" + windowMsg, severity)
+
+
+    def statusStr(self) :
+        s = self.lastPressMsg + "\n"
+        if not self.calCount :
+            s = s + self.label() + 'Baseline: {0:.2f} in.wc'.format(self.pFiltered) + "\n"
+        s = s + self.label() + self.pressRollups.summaryStr() + "\n"
+        if self.capture :
+            s = s + self.label() + self.capture.statsStr() + "\n"
+        return s
+
+
+    def state(self) :
+        return {
+            "sensor": self.sensorType(),
+            "pFiltered": self.pFiltered,
+            "calCount": self.calCount,
+            "lastAlertTimes": self.lastAlertTimes,
+            }
+
+
+    #
+    # Restore this sensor's saved state, returns a message for the console and status.
+    #   Alert times are always restored. The baseline is restored when it is complete,
+    #   recent, from the same sensor type, and the sensor reads now. A live reading
+    #   outside the alert band still restores the baseline, so a fan that failed while
+    #   the program was down alerts on the first average instead of being calibrated in.
+    #
+    def restore(self, state, age) :
+        lastAlertTime = state.get("lastAlertTime", 0)    # before alert times were kept per window
+        for window in self.lastAlertTimes :
+            self.lastAlertTimes[window] = state.get("lastAlertTimes", {}).get(window, lastAlertTime)
+
+        if state.get("calCount", 1) or age > stateMaxAge or age < 0 :
+            return self.label() + "Saved baseline incomplete or old, calibrating."
+
+        if state.get("sensor") != self.sensorType() :
+            return self.label() + "Saved baseline from another sensor type, calibrating."
+
+        # Quick check of live readings
+        live = streamStats.WindowStats()
+        for i in range(5) :
+            status, vacuum = self.abp.readVacuumStatus()
+            if status == 0 :
+                live.add(vacuum)
+            time.sleep(0.1)
+
+        if live.nValid < 3 :
+            return self.label() + "Sensor not reading, calibrating."
+
+        self.pFiltered = state["pFiltered"]
+        self.calCount = 0
+
+        s = self.label() + 'Restored baseline {0:.2f} in.wc saved {1:.0f} min ago, live {2:.2f} in.wc'.format(
+            self.pFiltered, age / 60, live.mean)
+        if not ((self.pFiltered-self.pDeltaLowSide) <= live.mean <= (self.pFiltered+self.pDeltaHighSide)) :
+            s = s + ", outside alert band"
+        return s
+
+# end class VacuumChannel
+
 
-    return s
+channels = [VacuumChannel(cfg, i) for i, cfg in enumerate(sensorConfig)]
+
+statusIntervalCntDn = 0
+lastStatusTime = 0                   # Last time status was sent
+lastStateSave = 0                    # Last time state was saved
 
 
 #
-# Start timer
+# Save baselines and alert throttle times. Written to a temporary file and renamed
+#   so a power loss leaves either the old or the new file, never a partial one.
 #
-def startTimer():
-    global timer
-    t = datetime.datetime.now()
-    # Timer(60 - t.second-t.microsecond/1000000., myTimer).start()                  # next minute
-    # Timer(1-t.microsecond/1000000., myTimer).start()                              # next second
-    Timer(tInterval-(t.second%tInterval)-t.microsecond/1000000.0, myTimer).start()  # next tInterval aligned within minute
+def saveState() :
+    global lastStateSave
+
+    lastStateSave = time.time()
+    if not STATE_FILE :
+        return
+
+    state = {
+        "time": lastStateSave,
+        "channels": {ch.name: ch.state() for ch in channels},
+        }
+    if AIRTHINGS :
+        state["wave"] = wave.alertState()
+
+    tmpName = STATE_FILE + ".tmp"
+    try :
+        with open(tmpName, 'w') as stateFile :
+            json.dump(state, stateFile)
+            stateFile.flush()
+            os.fsync(stateFile.fileno())
+        os.replace(tmpName, STATE_FILE)
+
+    except OSError as e :
+        print("Error saving state: " + str(e))
 
 
 #
-# Timer
+# Restore saved state at program start, returns a message for the console and status.
+#   A state file from a single sensor version restores the first sensor.
 #
-stopFlag = 0
-firstTimeAirthings = 1
-lastPressMsg = ""
-lastWaveMsg = ""
-
-def myTimer() :
-    global timer, count, sensorSum, lastReadTime, statusIntervalCntDn, lastAlertTime
-    global firstTimeAirthings
-    global lastPressMsg, lastWaveMsg
-   
-    t = datetime.datetime.now()
-
-    # Measure vacuum
-    status, result = abp.readAbpStatus()
-    if status == 0 : 
-        sensorSum = sensorSum + abp.pres2inwc(-result)       # change sign to convert pressure to vacuum
-        count = count + 1
-
-    # Calculate average vacuum over interval, log data, and check for alert conditions
-    if (count>=(tAverage*0.8) and t.second==0) :
-        sensorAvg = sensorSum/count
-        sensorSum = 0
-        count = 0
-
-        # Append interval data to CSV file
-        topic = "RadonMaster/PresSensor"
-        pubScribe.pubRecord(pubScribe.CSV_FILE, topic, str(round(sensorAvg,2)), "Inches w.c.")
-        """ MS-Excel UNIX seconds to date and time
-        date from seconds : =FLOOR(A2/86400,1)+DATE(1970,1,1)
-        HH:MM from seconds: =MOD(A2,86400)/86400
-        """
- 
-        sAlg = radonAlg(sensorAvg)
-
-        lastPressMsg = '{0:s} Vacuum: {1:7.2f} in.wc'.format(formatLocalTime(), round(sensorAvg, 2))
-        print(lastPressMsg + " " + sAlg)
-
-        if not( sAlg=="" or sAlg[:3]=="Cal" ) :
-            alertMsg = "Alert " + lastPressMsg
+def restoreState() :
+    try :
+        with open(STATE_FILE, 'r') as stateFile :
+            state = json.load(stateFile)
+    except (OSError, ValueError) :
+        return "No saved state, calibrating."
+
+    if AIRTHINGS and "wave" in state :
+        wave.restoreAlertState(state["wave"])
+
+    saved = state.get("channels")
+    if saved is None :
+        saved = {channels[0].name: state}
+
+    age = time.time() - state.get("time", 0)
+    msgs = []
+    for ch in channels :
+        if ch.name in saved :
+            msgs.append(ch.restore(saved[ch.name], age))
+        else :
+            msgs.append(ch.label() + "No saved state, calibrating.")
+    return "\n".join(msgs)
 
-            if pressAlertsEnabled :
-                tsec = time.time()
-                if ((tsec-lastAlertTime) > minIntervalBtwAlerts) :
-                    lastAlertTime = tsec
-                    topic = "RadonMaster/Alert"
-                    pubScribe.pubRecord(pubScribe.EMAIL_SMS, topic, alertMsg)
 
-                # pubScribe.pubRecord(pubScribe.BUZZER, 'Buzzer', {'Frequency': 700, 'Dutycycle': 10, 'Duration': 10})
+#
+# Start timer
+#
+scheduler = None
+
+def startTimer():
+    global scheduler
+    if captureEnabled :
+        for ch in channels :
+            ch.startCapture()
 
-            else :
-                print(alertMsg)
+    scheduler = tickScheduler.TickScheduler(tInterval, myTimer)    # next tInterval aligned within minute
+    scheduler.start()
 
-    #
-    if AIRTHINGS and (not (t.minute % 15)) and (t.second==30) :
-        if firstTimeAirthings :
-            firstTimeAirthings = 0
-            wave.writeHeaders()
 
-        try :
-            lastWaveMsg, alert = wave.readAirthings()
+def sigusr1Handler(signum, frame) :
+    for ch in channels :
+        if ch.capture :
+            ch.dumpCapture()
+
 
+#
+# Timer
+#
+lastWaveMsgs = {}                    # last WavePlus message by serial number
+lastTickWall = 0                     # Nominal wall time of previous tick
+
+def myTimer(tickNum, tWall) :
+    global lastReadTime, statusIntervalCntDn
+    global lastTickWall
+
+    # Nominal tick time from the scheduler, immune to NTP steps and late ticks
+    t = datetime.datetime.fromtimestamp(tWall)
+    if not lastTickWall :
+        lastTickWall = tWall - tInterval
+    minuteCrossed = tickScheduler.boundaryCrossed(lastTickWall, tWall, 60)
+    airthingsCrossed = tickScheduler.boundaryCrossed(lastTickWall, tWall, airthingsInterval, 30)
+    lastTickWall = tWall
+
+    # Read every sensor back to back, then run the checks, so all readings share the tick
+    readings = [ch.read() for ch in channels]
+    for ch, (status, vacuum) in zip(channels, readings) :
+        ch.process(tWall, status, vacuum, minuteCrossed)
+
+    # WavePlus reads run on the wave worker thread, this tick only queues and collects
+    if AIRTHINGS :
+        if airthingsCrossed :
+            wave.requestRead()
+
+        for tsec, serialNumber, waveMsg, alert in wave.pollResults() :
             if alert and waveAlertsEnabled :
-                topic = "RadonMaster/Alert"
-                pubScribe.pubRecord(pubScribe.EMAIL_SMS, topic, lastWaveMsg)
+                topic = "RadonMaster/Alert/WavePlus/" + wave.register(serialNumber).label()
+                pubScribe.pubRecord(pubScribe.EMAIL_SMS, topic, waveMsg)
             else :
-                print(lastWaveMsg)
-
-            lastWaveMsg = time.strftime("%a, %d %b %Y %H:%M:%S \n", time.localtime()) + lastWaveMsg
+                print(waveMsg)
 
-        except :
-            print("Exception with Bluepy Airthings Wave...")
+            lastWaveMsgs[serialNumber] = time.strftime("%a, %d %b %Y %H:%M:%S \n", time.localtime(tsec)) + waveMsg
         
 
+    # Checkpoint baseline and alert times
+    if (tWall - lastStateSave) >= stateSaveInterval :
+        saveState()
+
     # Send status message
-    if (statusMsgEnabled and t.hour==statusMsgHHMM[0] and t.minute==statusMsgHHMM[1] and t.second==0) :
+    if (statusMsgEnabled and minuteCrossed and t.hour==statusMsgHHMM[0] and t.minute==statusMsgHHMM[1]) :
         sendStatus = 0
 
         # Send status message every n days, after sending first status message
@@ -349,14 +845,14 @@ def myTimer() :
 
         if sendStatus :
             s = "Reporting at " + time.strftime("%a, %d %b %Y %H:%M:%S \n", time.localtime())
-            s = s + lastPressMsg + "\n" + lastWaveMsg
+            for ch in channels :
+                s = s + ch.statusStr()
+            s = s + "\n".join(lastWaveMsgs.values()) + "\n"
+            s = s + scheduler.statsStr() + "\n" + pubScribe.pubStatsStr()
+            if AIRTHINGS :
+                s = s + "\n" + wave.statsStr()
             topic = "RadonMaster/Status"
             pubScribe.pubRecord(pubScribe.EMAIL_SMS, topic, s)
-    
-
-    if not stopFlag :
-        t = datetime.datetime.now()
-        Timer(tInterval - t.microsecond/1000000., myTimer).start()	# every tInterval seconds
 
 
 
@@ -371,13 +867,21 @@ if __name__ == '__main__':
     paramCheck()
     
     # Display sensor results on program startup 
-    status, result, tempC = abp.readAbpStatusTemp()
+    s = ""
+    for ch in channels :
+        status, result, tempC = ch.abp.readAbpStatusTemp()
 
-    # change sign of result to convert pressure to vacuum
-    s = 'Status: {0:d}  Vacuum: {1:7.3f} {2:s} {3:7.2f} in.wc {4:5.1f} degF\n'.format(
-        status, round(-result,3), abp.PRES_UNITS, round(abp.pres2inwc(-result),2), round(abp.c2f(tempC),1))
+        # change sign of result to convert pressure to vacuum
+        s = s + ch.label() + 'Status: {0:d}  Vacuum: {1:7.3f} {2:s} {3:7.2f} in.wc {4:5.1f} degF\n'.format(
+            status, round(-result,3), ch.abp.PRES_UNITS, round(ch.abp.pres2inwc(-result),2), round(ch.abp.c2f(tempC),1))
     print(s)
 
+    if STATE_FILE :
+        sState = restoreState()
+        print(sState + "\n")
+        s = s + sState + "\n"
+    lastStateSave = time.time()
+
     pubScribe.connectPubScribe()
 
     if statusMsgEnabled :
@@ -385,6 +889,11 @@ if __name__ == '__main__':
         pubScribe.pubRecord(pubScribe.EMAIL_SMS, topic, "Program start\n" + s)
 
     startTimer()
+    signal.signal(signal.SIGUSR1, sigusr1Handler)
+
+    if AIRTHINGS :
+        wave.start()    # background scan if the WavePlus address is not cached
+        wave.startWorker()
 
     print("First averaged set of measurement will display in a few minutes...\n") # chg 2020-12-03
 
@@ -393,9 +902,21 @@ if __name__ == '__main__':
             time.sleep(1)
 
     except KeyboardInterrupt:
-        #timer.cancel()
-        stopFlag = 1
-        time.sleep(tInterval+1)
+        scheduler.stop()
+        print(scheduler.statsStr())
+        for ch in channels :
+            if ch.capture :
+                ch.capture.stop()
+                print(ch.label() + ch.capture.statsStr())
+
+    for ch in channels :
+        ch.pressRollups.close()    # publish partial hour and day
+        if ch.recorder :
+            ch.recorder.close()    # pending snapshots with the readings so far
+    saveState()
+
+    if AIRTHINGS :
+        wave.stopWorker()
 
     pubScribe.disconnectPubScribe()
 
@@ -11,6 +11,21 @@ REVISION HISTORY
   yyyy/mm/dd  --------------- -------------------------------------
   2021/03/01  BrucesHobbies   Revised default log file names
   2021/03/05  BrucesHobbies   Updated for pubScribe
+  2026/10/17  BrucesHobbies   Added importBin() memory mapped binary log reader
+                              Readers select day/month partitions by time range
+                              and read gzip/zstd compressed partitions
+                              importCsv() seeks with the sparse .idx index
+                              Vectorized loadCsv() and datetime64 time axis
+                              Min/max level of detail decimation for plots
+                              Rollup reader and queryLevel() resolution choice
+                              Vacuum plotted with window min/max and std
+                              and the alert baseline
+                              plotSnapshot() for black box alert snapshots
+                              Plots the log of every WavePlus device
+                              and of every pressure sensor
+                              Csv rows parsed as streamed from the file range
+                              importLog() keeps csv history from before the
+                              binary log was enabled
 
 
 OVERVIEW:
@@ -48,8 +63,274 @@ import matplotlib.dates as mdates
 import numpy as np
 import math
 import time
-import datetime
 import csv
+import json
+import struct
+import os
+import re
+import io
+import gzip
+import warnings
+
+try :
+    import zstandard    # only needed for .zst compressed log partitions
+except ImportError :
+    zstandard = None
+
+
+#
+# Log partitions written by pubScribe: basename_yyyy-mm.csv or basename_yyyy-mm-dd.csv,
+# optionally compressed (.gz, .zst), plus the unpartitioned basename.csv.
+#
+partitionRe = re.compile(r'_(\d{4}-\d{2}(?:-\d{2})?)(\.csv|\.bin)(\.gz|\.zst)?$')
+
+def partitionRange(dateStr) :
+    # local time range [t0, t1) in UNIX seconds covered by a partition
+    parts = [int(x) for x in dateStr.split('-')]
+    if len(parts) == 2 :
+        y, m = parts
+        t0 = time.mktime((y, m, 1, 0, 0, 0, 0, 0, -1))
+        t1 = time.mktime((y + m // 12, m % 12 + 1, 1, 0, 0, 0, 0, 0, -1))
+    else :
+        y, m, d = parts
+        t0 = time.mktime((y, m, d, 0, 0, 0, 0, 0, -1))
+        t1 = time.mktime((y, m, d + 1, 0, 0, 0, 0, 0, -1))
+    return t0, t1
+
+
+#
+# Files of a log in time order, partitions outside [start, end] are skipped
+#
+def logPartitions(basename, ext, start=None, end=None) :
+    folder, base = os.path.split(basename)
+
+    files = {}
+    if os.path.isfile(basename + ext) :
+        files[basename + ext] = -math.inf    # unpartitioned log, time range unknown
+
+    for name in os.listdir(folder or ".") :
+        m = partitionRe.search(name)
+        if not m or name[:m.start()] != base or m.group(2) != ext :
+            continue
+
+        t0, t1 = partitionRange(m.group(1))
+        if (end is not None and t0 > end) or (start is not None and t1 <= start) :
+            continue
+
+        # While a partition is being compressed both copies exist, use the original
+        plain = os.path.join(folder, name[:m.end(2)])
+        if m.group(3) and os.path.isfile(plain) :
+            continue
+        files[os.path.join(folder, name)] = t0
+
+    return sorted(files, key=lambda f : files[f])
+
+
+#
+# Open a log file for text reading from a byte offset, compressed or not.
+#   Offsets are into the uncompressed text, compressed streams decompress up to it.
+#
+def openLog(filename, offset=0) :
+    return io.TextIOWrapper(openLogBytes(filename, offset), encoding='utf-8', newline='')
+
+
+def openLogBytes(filename, offset=0) :
+    if filename.endswith(".gz") :
+        raw = gzip.open(filename, 'rb')
+    elif filename.endswith(".zst") :
+        if zstandard is None :
+            raise ImportError("zstandard is required to read " + filename + " (sudo pip3 install zstandard)")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), closefd=True)
+    else :
+        raw = open(filename, 'rb')
+
+    if offset :
+        raw.seek(offset)
+    return raw
+
+
+#
+# Sidecar index (log.csv.idx, int64 pairs of UNIX seconds and byte offset) written by pubScribe
+#
+def loadIndex(filename) :
+    m = re.search(r'(\.gz|\.zst)$', filename)
+    idxName = (filename[:m.start()] if m else filename) + ".idx"
+    if not os.path.isfile(idxName) :
+        return None
+    return np.fromfile(idxName, dtype=[('t', '<i8'), ('offset', '<i8')])
+
+
+#
+# Byte offset of the last indexed row at or before start
+#
+def indexOffset(filename, start, index=None) :
+    if index is None :
+        index = loadIndex(filename)
+    if start is None or index is None :
+        return 0
+
+    i = np.searchsorted(index['t'], start, 'right') - 1
+    if i < 0 :
+        return 0
+    return int(index['offset'][i])
+
+
+#
+# Byte offset of the first indexed row after end, None to read to end of file
+#
+def indexEndOffset(filename, end, index=None) :
+    if index is None :
+        index = loadIndex(filename)
+    if end is None or index is None :
+        return None
+
+    i = np.searchsorted(index['t'], end, 'right')
+    if i >= len(index) :
+        return None
+    return int(index['offset'][i])
+
+
+#
+# Header row of a csv log
+#
+def readHeader(filename) :
+    with openLog(filename) as csvfile :
+        return next(csv.reader(csvfile), None)
+
+
+#
+# Convert UNIX seconds to local time datetime64 in one pass.
+#   Offsets from UTC are looked up once per distinct hour so DST changes are kept.
+#
+def localDatetime64(tStamp) :
+    tStamp = np.asarray(tStamp, dtype=np.float64)
+    if not len(tStamp) :
+        return tStamp.astype('datetime64[ms]')
+
+    hours, inverse = np.unique(np.floor(tStamp / 3600.0).astype(np.int64), return_inverse=True)
+    offsets = np.array([time.localtime(h * 3600).tm_gmtoff for h in hours], dtype=np.float64)
+
+    return np.round((tStamp + offsets[inverse.reshape(-1)]) * 1000.0).astype(np.int64).view('datetime64[ms]')
+
+
+#
+# Byte stream of a log file from offset up to endOffset (None for end of file),
+#   so a byte range is parsed as it is read rather than loaded whole.
+#
+class LogRange(io.RawIOBase) :
+    def __init__(self, filename, offset=0, endOffset=None) :
+        self.raw = openLogBytes(filename, offset)
+        self.remaining = None if endOffset is None else max(endOffset - offset, 0)
+
+    def readable(self) :
+        return True
+
+    def readinto(self, b) :
+        n = len(b) if self.remaining is None else min(len(b), self.remaining)
+        if not n :
+            return 0
+        data = self.raw.read(n)
+        b[:len(data)] = data
+        if self.remaining is not None :
+            self.remaining -= len(data)
+        return len(data)
+
+    def close(self) :
+        self.raw.close()
+        super().close()
+
+# end class LogRange
+
+
+def openLogRange(filename, offset=0, endOffset=None) :
+    return io.TextIOWrapper(io.BufferedReader(LogRange(filename, offset, endOffset), 1 << 16), encoding='utf-8')
+
+
+#
+# Parse the rows of one csv file into a 2D float array of the wanted columns.
+#   usecols are column numbers within the file, rows are read from byte offset
+#   up to endOffset and parsed in chunks as they are read.
+#
+def parseCsvRows(filename, usecols, offset=0, endOffset=None, dtype=np.float64) :
+    skip = 0 if offset else 1    # header row
+
+    try :
+        with openLogRange(filename, offset, endOffset) as csvfile, warnings.catch_warnings() :
+            warnings.simplefilter("ignore", UserWarning)      # range with no rows
+            rows = np.loadtxt(csvfile, delimiter=',', usecols=usecols, dtype=dtype, ndmin=2, comments=None, skiprows=skip)
+    except ValueError :
+        # Empty or text cells, slower parser that fills them with NaN
+        with openLogRange(filename, offset, endOffset) as csvfile, warnings.catch_warnings() :
+            warnings.simplefilter("ignore", UserWarning)
+            rows = np.genfromtxt(csvfile, delimiter=',', usecols=usecols, dtype=dtype, filling_values=np.nan,
+                                 invalid_raise=False, comments=None, skip_header=skip)
+
+    if not rows.size :
+        return np.zeros((0, len(usecols)), dtype=dtype)
+    return rows.reshape(-1, len(usecols))
+
+
+#
+# Vectorized csv log loader.
+#   filename is a csv file or a log basename (no extension) whose partitions are
+#   read in time order, using the sidecar index to skip to start.
+#   columns: list of column names to load, None for all.
+#   Returns {"t": UNIX seconds, "datetime": local datetime64, column: array, ...}
+#   with the sentinel value (-99) replaced by NaN. Columns missing from older
+#   partitions are NaN.
+#
+def loadCsv(filename, columns=None, start=None, end=None, sentinel=-99, dtype=np.float64) :
+    if filename.endswith(".csv") and os.path.isfile(filename) :
+        files = [filename]
+    else :
+        files = logPartitions(filename[:-4] if filename.endswith(".csv") else filename, ".csv", start, end)
+
+    names = list(columns) if columns else []
+    chunks = []
+
+    for fname in files :
+        print("Reading " + fname)
+
+        fileHdr = readHeader(fname)
+        if not fileHdr :
+            continue
+        if not columns :
+            names += [name for name in fileHdr[2:] if not (name in names)]
+
+        fileCols = [name for name in names if name in fileHdr[2:]]
+        usecols = [0] + [fileHdr.index(name) for name in fileCols]
+
+        index = loadIndex(fname)
+        rows = parseCsvRows(fname, usecols, indexOffset(fname, start, index), indexEndOffset(fname, end, index), dtype)
+        chunks.append((fileCols, rows))
+
+    # Assemble columns, filling those a partition lacks
+    nRows = sum(len(rows) for fileCols, rows in chunks)
+    result = {"t": np.empty(nRows, dtype=np.float64)}
+    for name in names :
+        result[name] = np.full(nRows, np.nan, dtype=dtype)
+
+    i = 0
+    for fileCols, rows in chunks :
+        result["t"][i:i+len(rows)] = rows[:, 0]
+        for j, name in enumerate(fileCols) :
+            result[name][i:i+len(rows)] = rows[:, j+1]
+        i += len(rows)
+
+    # Exact time range, index offsets are sparse
+    mask = np.ones(nRows, dtype=bool)
+    if start is not None :
+        mask &= result["t"] >= start
+    if end is not None :
+        mask &= result["t"] <= end
+    if not mask.all() :
+        result = {key : result[key][mask] for key in result}
+
+    for name in names :
+        result[name][result[name] == sentinel] = np.nan
+
+    result["datetime"] = localDatetime64(result["t"])
+    return result
 
 
 #
@@ -58,30 +339,262 @@ import csv
 #   Ignore text string with date/time from second column
 #   data is columns [2:]
 #
-def importCsv(filename) :
-    print("Reading " + filename)
+#   filename is a csv file or a log basename (no extension) whose partitions
+#   are read in time order. Rows outside [start, end] (UNIX seconds) are skipped.
+#   Returns numpy arrays, see loadCsv().
+#
+def importCsv(filename, start=None, end=None, columns=None) :
+    result = loadCsv(filename, columns, start, end)
+
+    hdr = [key for key in result if not (key in ("t", "datetime"))]
+    print(hdr)
 
-    with open(filename, 'r') as csvfile :
-        csvData = list(csv.reader(csvfile))
+    data = {name : result[name] for name in hdr}
+
+    return hdr, result["t"], data
+
+
+#
+# Read a pubScribe binary log (BIN_FILE) by memory mapping it.
+#   Records are int64 UNIX time in ms followed by float32 columns. The data
+#   arrays returned are views into the mapped file, nothing is parsed or copied.
+#   Returns the same (hdr, tStamp, data) as importCsv() with tStamp in seconds.
+#
+BIN_MAGIC = b'RMBIN001'
 
-    hdr = csvData[0]
+def binSchema(filename) :
+    with open(filename, 'rb') as binFile :
+        magic = binFile.read(len(BIN_MAGIC))
+        if magic != BIN_MAGIC :
+            raise ValueError(filename + " is not a pubScribe binary log")
+        schemaLen = struct.unpack('<I', binFile.read(4))[0]
+        schema = json.loads(binFile.read(schemaLen).decode('utf-8'))
+
+    schema["offset"] = len(BIN_MAGIC) + 4 + schemaLen
+    schema["dtype"] = np.dtype([('t', '<i8')] + [(c, '<f4') for c in schema["columns"]])
+    return schema
+
+
+def mapBin(filename) :
+    schema = binSchema(filename)
+    dtype = schema["dtype"]
+
+    # A partial trailing record (write in progress) is ignored
+    nRecords = (os.path.getsize(filename) - schema["offset"]) // dtype.itemsize
+    if nRecords <= 0 :
+        return schema, np.zeros(0, dtype=dtype)
+
+    records = np.memmap(filename, dtype=dtype, mode='r', offset=schema["offset"], shape=(nRecords,))
+    return schema, records
+
+
+#
+# Records of one file limited to [start, end] UNIX seconds, still a view of the map
+#
+def sliceRecords(records, start=None, end=None) :
+    i0 = 0 if start is None else np.searchsorted(records['t'], int(start * 1000), 'left')
+    i1 = len(records) if end is None else np.searchsorted(records['t'], int(end * 1000), 'right')
+    return records[i0:i1]
+
+
+#
+# Copy records into another schema, columns it lacks are NaN
+#
+def alignRecords(records, dtype) :
+    result = np.zeros(len(records), dtype=dtype)
+    for name in dtype.names :
+        result[name] = records[name] if name in records.dtype.names else np.nan
+    return result
+
+
+#
+#   filename is a .bin file or a log basename (no extension) whose partitions are
+#   read in time order. A single partition is returned without copying, several
+#   partitions are concatenated.
+#
+def importBin(filename, start=None, end=None) :
+    if filename.endswith(".bin") and os.path.isfile(filename) :
+        files = [filename]
+    else :
+        files = logPartitions(filename[:-4] if filename.endswith(".bin") else filename, ".bin", start, end)
+
+    parts = []
+    for fname in files :
+        print("Reading " + fname)
+        schema, records = mapBin(fname)
+        parts.append(sliceRecords(records, start, end))
+
+    if not parts :
+        return [], np.zeros(0), {}
+
+    # Newest partition defines the columns
+    dtype = parts[-1].dtype
+    parts = [p if p.dtype == dtype else alignRecords(p, dtype) for p in parts]
+    records = parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    hdr = list(dtype.names[1:])
     print(hdr)
 
-    tStamp = []
-    for row in csvData[1:] :
-        tStamp.append(float(row[0]))
+    tStamp = records['t'] / 1000.0
+    data = {name : records[name] for name in hdr}
 
-    data = {name : [] for name in hdr[2:]}
-    # print(data)
+    return hdr, tStamp, data
 
-    for row in csvData[1:] :
-        for idx in range(2,len(hdr)) :
-            n = float(row[idx])
-            if n == -99 :
-                n = np.nan
-            data[hdr[idx]].append(n)
 
-    return hdr[2:], tStamp, data
+#
+# UNIX seconds of the first record in the binary log, None if it has no records
+#
+def firstBinTime(basename) :
+    for fname in logPartitions(basename, ".bin") :
+        schema, records = mapBin(fname)
+        if len(records) :
+            return records['t'][0] / 1000.0
+    return None
+
+
+#
+# Read the binary log if one exists, else the csv log. Csv history from before
+#   the first binary record (binary log enabled later) is read from the csv log
+#   and merged ahead of it, columns missing from either log are NaN.
+#
+def importLog(basename, start=None, end=None) :
+    binStart = firstBinTime(basename) if logPartitions(basename, ".bin") else None
+    if binStart is None :
+        return importCsv(basename, start, end)
+
+    hdr, tStamp, data = importBin(basename, start, end)
+    if (start is not None and start >= binStart) or not logPartitions(basename, ".csv", start, binStart) :
+        return hdr, tStamp, data
+
+    csvEnd = binStart - 0.001 if end is None else min(end, binStart - 0.001)
+    csvHdr, csvTStamp, csvData = importCsv(basename, start, csvEnd)
+    if not len(csvTStamp) :
+        return hdr, tStamp, data
+
+    merged = hdr + [name for name in csvHdr if not (name in hdr)]
+    csvNan = np.full(len(csvTStamp), np.nan)
+    binNan = np.full(len(tStamp), np.nan)
+    data = {name : np.concatenate((csvData.get(name, csvNan), data.get(name, binNan))) for name in merged}
+
+    return merged, np.concatenate((csvTStamp, tStamp)), data
+
+
+#
+# Rollups written by rollup.py: basename_1h, basename_1d with Count, Sum, Mean, Min, Max, Last.
+#   Rows with the same bucket time (a bucket split across a restart) are merged.
+#   Returns {"t", "datetime", "Count", "Mean", "Min", "Max"}
+#
+ROLLUP_LEVELS = (("", 60), ("_1h", 3600), ("_1d", 86400))    # suffix, seconds per row
+
+
+def loadRollup(basename, start=None, end=None) :
+    hdr, tStamp, data = importLog(basename, start, end)
+    if not len(tStamp) :
+        return {"t": np.zeros(0), "datetime": localDatetime64([]), "Count": np.zeros(0),
+                "Mean": np.zeros(0), "Min": np.zeros(0), "Max": np.zeros(0)}
+
+    t, first, inverse = np.unique(np.asarray(tStamp), return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    count = np.bincount(inverse, weights=np.asarray(data["Count"], dtype=np.float64))
+    total = np.bincount(inverse, weights=np.asarray(data["Sum"], dtype=np.float64))
+    vMin = np.full(len(t), np.inf)
+    vMax = np.full(len(t), -np.inf)
+    np.minimum.at(vMin, inverse, np.asarray(data["Min"], dtype=np.float64))
+    np.maximum.at(vMax, inverse, np.asarray(data["Max"], dtype=np.float64))
+
+    with np.errstate(invalid='ignore', divide='ignore') :
+        mean = total / count
+
+    return {"t": t, "datetime": localDatetime64(t), "Count": count, "Mean": mean, "Min": vMin, "Max": vMax}
+
+
+#
+# Read the coarsest level (1 minute log, hourly, or daily rollup) whose rows are
+# no longer than resolution seconds. Levels without data fall back to finer ones.
+#   Returns rollup columns, the 1 minute log has Mean = Min = Max.
+#
+def queryLevel(basename, start=None, end=None, resolution=60) :
+    for suffix, period in reversed(ROLLUP_LEVELS) :
+        if period > resolution :
+            continue
+
+        if suffix :
+            if logPartitions(basename + suffix, ".bin") or logPartitions(basename + suffix, ".csv") :
+                print("Level " + suffix[1:])
+                return loadRollup(basename + suffix, start, end)
+
+        else :
+            hdr, tStamp, data = importLog(basename, start, end)
+            value = np.asarray(data[hdr[0]], dtype=np.float64) if hdr else np.zeros(0)
+            t = np.asarray(tStamp, dtype=np.float64)
+            return {"t": t, "datetime": localDatetime64(t), "Count": np.ones(len(t)),
+                    "Mean": value, "Min": value, "Max": value}
+
+
+#
+# Level of detail.
+#   Long series are reduced to the min and max of each x bucket (about one bucket
+#   per screen pixel) so spikes and steps stay visible. The visible range is
+#   decimated again whenever the x limits change (zoom, pan).
+#
+LOD_BUCKETS = 2000     # buckets for the initial full range plot
+LOD_MIN_BUCKETS = 200  # lower bound when sizing buckets from the axes width in pixels
+
+
+def decimateMinMax(x, y, x0, x1, nBuckets) :
+    # x sorted, returns two points (min, max) per non empty bucket in [x0, x1)
+    edges = np.linspace(x0, x1, nBuckets + 1)
+    starts = np.searchsorted(x, edges[:-1], 'left')
+    ends = np.searchsorted(x, edges[1:], 'left')
+    used = ends > starts
+    starts = starts[used]
+
+    if not len(starts) :
+        return x[:0], y[:0]
+
+    yMin = np.fmin.reduceat(y, starts)    # fmin/fmax ignore NaN within a bucket
+    yMax = np.fmax.reduceat(y, starts)
+    xMid = (edges[:-1][used] + edges[1:][used]) / 2.0
+
+    xOut = np.repeat(xMid, 2)
+    yOut = np.empty(2 * len(starts), dtype=np.float64)
+    yOut[0::2] = yMin
+    yOut[1::2] = yMax
+    return xOut, yOut
+
+
+def decimateRange(x, y, x0, x1, nBuckets) :
+    # Visible samples plus one neighbor each side so the line reaches the edges
+    i0 = max(np.searchsorted(x, x0, 'left') - 1, 0)
+    i1 = min(np.searchsorted(x, x1, 'right') + 1, len(x))
+    xs = x[i0:i1]
+    ys = y[i0:i1]
+
+    if len(xs) <= 2 * nBuckets :
+        return xs, ys
+
+    xd, yd = decimateMinMax(xs[1:-1], ys[1:-1], xs[1], xs[-2] + 1e-9, nBuckets)
+    return np.concatenate((xs[:1], xd, xs[-1:])), np.concatenate((ys[:1], yd, ys[-1:]))
+
+
+def plotLod(ax, t, y, **kwargs) :
+    x = mdates.date2num(t)
+    y = np.asarray(y, dtype=np.float64)
+
+    if not len(x) :
+        return ax.plot(x, y, **kwargs)[0]
+
+    line = ax.plot(*decimateRange(x, y, x[0], x[-1], LOD_BUCKETS), **kwargs)[0]
+
+    def update(axes) :
+        x0, x1 = axes.get_xlim()
+        nBuckets = max(int(axes.bbox.width), LOD_MIN_BUCKETS)
+        line.set_data(*decimateRange(x, y, x0, x1, nBuckets))
+
+    ax.callbacks.connect('xlim_changed', update)
+    ax.xaxis_date()
+    return line
 
 
 #
@@ -89,14 +602,14 @@ def importCsv(filename) :
 #
 def plotMultiVar(tStamp, data, title) :
 
-    t = [datetime.datetime.fromtimestamp(ts) for ts in tStamp]
+    t = localDatetime64(tStamp)
 
     fig = plt.figure()
     ax1 = fig.add_subplot(1, 1, 1)
 
     for item in data :
         # print(item)
-        ax1.plot(t, data[item], label=item)
+        plotLod(ax1, t, data[item], label=item)
         # ax1.plot(t, data[item], marker='d', label=item)
 
     ax1.set_title(title)
@@ -118,12 +631,12 @@ def plotMultiVar(tStamp, data, title) :
 #
 def plotSingleVar(tStamp, data, title, item) :
 
-    t = [datetime.datetime.fromtimestamp(ts) for ts in tStamp]
+    t = localDatetime64(tStamp)
 
     fig = plt.figure()
     ax1 = fig.add_subplot(1, 1, 1)
 
-    ax1.plot(t, data[item], label=item)
+    plotLod(ax1, t, data[item], label=item)
     # ax1.plot(t, data[item], marker='d', label=item)
 
     ax1.set_title(title)
@@ -136,24 +649,79 @@ def plotSingleVar(tStamp, data, title, item) :
     plt.gca().xaxis.set_major_formatter(dateFmt)
 
 
+#
+# Log basenames of a topic and its per device or per sensor topics
+#   ("RadonMaster_WavePlus" finds RadonMaster_WavePlus, RadonMaster_WavePlus_<name>, ...)
+#   Rollup logs (_1h, _1d) and files moved aside (*.old.csv, *.old.bin) are left out.
+#
+def topicLogs(prefix, folder=".") :
+    bases = set()
+    for name in os.listdir(folder) :
+        if not name.startswith(prefix) or ".old." in name :
+            continue
+        m = partitionRe.search(name)
+        if m :
+            base = name[:m.start()]
+        elif name.endswith(".csv") or name.endswith(".bin") :
+            base = name[:-4]
+        else :
+            continue
+
+        if (base == prefix or base[len(prefix)] == "_") and not any(base.endswith(suffix) for suffix, seconds in ROLLUP_LEVELS[1:]) :
+            bases.add(base)
+    return sorted(os.path.join(folder, base) if folder != "." else base for base in bases)
+
+
+#
+# Plot a black box snapshot (RadonMaster_BlackBox_*.csv.gz) with the alert time marked
+#
+def plotSnapshot(filename) :
+    with openLog(filename, 0) as snapFile :
+        comment = snapFile.readline()
+        snapFile.readline()    # header
+        data = np.loadtxt(snapFile, delimiter=',', ndmin=2)
+
+    tAlert = float(comment.split()[3])
+    t = localDatetime64(data[:, 0])
+
+    fig = plt.figure()
+    ax1 = fig.add_subplot(1, 1, 1)
+    ax1.plot(t, data[:, 1], label="Inches w.c.")
+    ax1.axvline(localDatetime64([tAlert])[0], color='r', linestyle='--', label="Alert")
+    ax1.set_title(os.path.basename(filename) + "\n" + " ".join(comment.split()[4:]))
+    ax1.set_ylabel("Inches w.c.")
+    ax1.legend(loc='upper right', shadow=True)
+    ax1.grid(which='both')
+
+    plt.gcf().autofmt_xdate()    # slant labels
+    dateFmt = mdates.DateFormatter('%H:%M:%S')
+    plt.gca().xaxis.set_major_formatter(dateFmt)
+
+
 #
 # Plot two files
 #
 if __name__ == "__main__" :
 
-    # --- WavePlus data ---
+    # --- WavePlus data, one log per device ---
     #  (time in column 0, data in columns 2:)
-    filename = "RadonMaster_WavePlus.csv"
-    header, tStamp, data = importCsv(filename)
+    for filename in topicLogs("RadonMaster_WavePlus") :
+        header, tStamp, data = importLog(filename)
 
-    for item in data :
-        plotSingleVar(tStamp, data, filename[:-4], item)
+        for item in data :
+            plotSingleVar(tStamp, data, filename, item)
+
+    # --- Mitigation fan pressure, one log per sensor ---
+    for filename in topicLogs("RadonMaster_PresSensor") :
+        header, tStamp, data = importLog(filename)
+        title = 'Mitigation Fan Vacuum' + filename[len("RadonMaster_PresSensor"):].replace("_", " ")
 
-    # --- Mitigation fan pressure ---
-    filename = "RadonMaster_PresSensor.csv"
-    header, tStamp, data = importCsv(filename)
+        # Average with window min and max, then gustiness (std) on its own plot
+        vacuum = {item: data[item] for item in ("Inches w.c.", "Min", "Max", "Baseline") if item in data}
+        plotMultiVar(tStamp, vacuum, title)
 
-    plotMultiVar(tStamp, data, 'Mitigation Fan Vacuum')
+        if "Std" in data :
+            plotSingleVar(tStamp, data, title, "Std")
 
     # Pause to close plots
     plt.show(False)    # Blocks, user must close plot window
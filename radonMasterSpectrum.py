@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+
+"""
+Copyright(C) 2026, BrucesHobbies
+All Rights Reserved
+
+AUTHOR: BrucesHobbies
+DATE: 10/17/2026
+REVISION HISTORY
+  DATE        AUTHOR          CHANGES
+  yyyy/mm/dd  --------------- -------------------------------------
+
+
+OVERVIEW:
+    Spectral analysis of the mitigation fan vacuum fluctuations (wind gusts,
+    sump pumping, fan start up) for choosing tAverage and the alert deltas.
+
+    Input is the per second log (secondLogEnabled in radonMaster.py, written
+    to RadonMaster_PresSensorSec_*.bin) or a raw capture dump
+    (RadonMaster_AbpRaw_*.bin). Readings are placed on a uniform time grid
+    with NaN for missing readings, then all segments are processed at once
+    as NumPy arrays, so weeks of one second data take a few seconds.
+
+    - Welch power spectral density (Hann window, segments with gaps skipped)
+    - Spectrogram of the PSD over time
+    - Hourly gustiness: std of the readings, std of the fluctuations faster
+      than tAverage (GustStd), and std left in the tAverage averages (AvgStd)
+      written to RadonMaster_Gustiness.csv
+    - Allan deviation of the averages against averaging time. tAverage is
+      long enough where the curve flattens, and alert deltas should be
+      several times the deviation at tAverage to avoid false alerts.
+
+    python3 radonMasterSpectrum.py [log basename or raw dump file] [days]
+
+LICENSE:
+    This program code and documentation are for personal private use only.
+    No commercial use of this code is allowed without prior written consent.
+
+    This program is free for you to inspect, study, and modify for your
+    personal private use.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import sys
+import os
+import time
+import warnings
+
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+
+import radonMasterPlot
+import sensorHnyAbp
+
+
+#
+# Raw capture dump (sensorHnyAbp.AbpCapture.dump()) to (UNIX times, vacuum in.wc,
+#   readings per second), failed reads are NaN
+#
+def loadRawDump(filename) :
+    info, times, status, vacuum = sensorHnyAbp.decodeRawDump(filename)
+    vacuum[status != 0] = np.nan          # status not normal
+
+    return times, vacuum, float(info["rate"])
+
+
+#
+# Per second log or raw dump: returns (UNIX times, vacuum in.wc, readings per second)
+#
+def loadSeries(name, start=None, end=None) :
+    if name.endswith(".bin") and os.path.isfile(name) :
+        with open(name, "rb") as f :
+            if f.read(len(sensorHnyAbp.RAW_MAGIC)) == sensorHnyAbp.RAW_MAGIC :
+                return loadRawDump(name)
+
+    hdr, tStamp, data = radonMasterPlot.importLog(name, start, end)
+    if not hdr :
+        return np.zeros(0), np.zeros(0), 1.0
+
+    t = np.asarray(tStamp, dtype=np.float64)
+    dt = np.median(np.diff(t)) if len(t) > 1 else 1.0
+    return t, np.asarray(data[hdr[0]], dtype=np.float64), 1.0 / dt
+
+
+#
+# Place readings on a uniform grid of fs per second. Gaps up to maxGap seconds (a dropped
+#   tick or failed read) are filled by linear interpolation, longer gaps are NaN.
+#   Returns (UNIX time of grid[0], grid)
+#
+def uniformGrid(t, x, fs, maxGap=5) :
+    t0 = t[0]
+    idx = np.round((t - t0) * fs).astype(np.int64)
+    grid = np.full(idx[-1] + 1, np.nan)
+    grid[idx] = x
+    return t0, fillGaps(grid, int(maxGap * fs))
+
+
+def fillGaps(x, maxGap) :
+    missing = np.isnan(x)
+    if not missing.any() or missing.all() :
+        return x
+
+    # Runs of missing readings: starts and lengths
+    edges = np.diff(np.concatenate(([0], missing.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    lengths = np.flatnonzero(edges == -1) - starts
+
+    good = np.flatnonzero(~missing)
+    filled = x.copy()
+    filled[missing] = np.interp(np.flatnonzero(missing), good, x[good])
+
+    # Long gaps and gaps at the ends stay missing
+    keep = (lengths > maxGap) | (starts == 0) | (starts + lengths == len(x))
+    filled[missing] = np.where(np.repeat(keep, lengths), np.nan, filled[missing])
+    return filled
+
+
+#
+# Segments of nperseg readings every step readings, as a view without copying
+#
+def segments(x, nperseg, step) :
+    if len(x) < nperseg :
+        return np.zeros((0, nperseg))
+    return np.lib.stride_tricks.sliding_window_view(x, nperseg)[::step]
+
+
+#
+# One sided PSD (in.wc^2/Hz) of each segment, mean removed and Hann windowed
+#
+def segmentPsd(seg, fs) :
+    win = np.hanning(seg.shape[1])
+    spec = np.fft.rfft((seg - seg.mean(axis=1, keepdims=True)) * win, axis=1)
+    psd = (spec.real**2 + spec.imag**2) / (fs * (win**2).sum())
+    psd[:, 1:(seg.shape[1]+1)//2] *= 2.0    # fold negative frequencies, not DC or Nyquist
+    return psd
+
+
+#
+# Welch PSD averaged over the segments without missing readings.
+#   Returns (frequencies Hz, psd, segments used)
+#
+def welch(x, fs, nperseg=1024, overlap=0.5) :
+    f = np.fft.rfftfreq(nperseg, 1.0 / fs)
+    seg = segments(x, nperseg, max(1, int(nperseg * (1.0 - overlap))))
+    seg = seg[~np.isnan(seg).any(axis=1)]
+    if not len(seg) :
+        return f, np.full(len(f), np.nan), 0
+
+    return f, segmentPsd(seg, fs).mean(axis=0), len(seg)
+
+
+#
+# PSD of consecutive segments. Returns (segment center UNIX times, frequencies, psd[segment, frequency])
+#   Segments with missing readings are NaN.
+#
+def spectrogram(t0, x, fs, nperseg=600) :
+    seg = segments(x, nperseg, nperseg)
+    tSeg = t0 + (np.arange(len(seg)) * nperseg + nperseg / 2.0) / fs
+    f = np.fft.rfftfreq(nperseg, 1.0 / fs)
+    if not len(seg) :
+        return tSeg, f, np.zeros((0, len(f)))
+
+    gaps = np.isnan(seg).any(axis=1)
+    psd = segmentPsd(np.where(gaps[:, None], 0.0, seg), fs)
+    psd[gaps] = np.nan
+    return tSeg, f, psd
+
+
+#
+# Reshape the grid into rows of period seconds aligned to UNIX time, padding with NaN.
+#   Returns (UNIX time of each row, rows)
+#
+def periodRows(t0, x, fs, period) :
+    n = int(round(period * fs))
+    tFirst = np.floor(t0 / period) * period
+    pad = int(round((t0 - tFirst) * fs))
+    padded = np.concatenate((np.full(pad, np.nan), x, np.full((-(pad + len(x))) % n, np.nan)))
+    rows = padded.reshape(-1, n)
+    return tFirst + np.arange(len(rows)) * period, rows
+
+
+#
+# Gustiness per period (default hourly).
+#   Std    : std of the readings
+#   GustStd: std of the readings about their tAverage means, fluctuations faster than tAverage
+#   AvgStd : std of the tAverage means, what remains after averaging
+#   Returns {"t", "Mean", "Std", "GustStd", "AvgStd", "Count"}
+#
+def gustiness(t0, x, fs, period=3600, tAverage=60) :
+    tRows, rows = periodRows(t0, x, fs, period)
+    b = int(round(tAverage * fs))
+    blocks = rows[:, :(rows.shape[1] // b) * b].reshape(len(rows), -1, b)
+
+    with warnings.catch_warnings() :
+        warnings.simplefilter("ignore", category=RuntimeWarning)    # all NaN hours
+        blockMean = np.nanmean(blocks, axis=2)
+        result = {
+            "t": tRows,
+            "Mean": np.nanmean(rows, axis=1),
+            "Std": np.nanstd(rows, axis=1),
+            "GustStd": np.sqrt(np.nanmean((blocks - blockMean[:, :, None])**2, axis=(1, 2))),
+            "AvgStd": np.nanstd(blockMean, axis=1),
+            "Count": np.count_nonzero(~np.isnan(rows), axis=1),
+            }
+
+    return result
+
+
+#
+# Allan deviation of averages of each length in seconds: sqrt(mean(diff(averages)^2) / 2).
+#   Unlike the std of the averages it is not raised by slow daily changes.
+#
+def allanDeviation(x, fs, seconds=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 900)) :
+    result = []
+    for s in seconds :
+        b = int(round(s * fs))
+        if b < 1 or len(x) < 3 * b :
+            continue
+        blocks = x[:(len(x) // b) * b].reshape(-1, b)
+        good = np.count_nonzero(~np.isnan(blocks), axis=1) >= 0.8 * b
+        with warnings.catch_warnings() :
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            means = np.where(good, np.nanmean(blocks, axis=1), np.nan)
+        d = np.diff(means)
+        d = d[~np.isnan(d)]
+        if len(d) :
+            result.append((s, float(np.sqrt(0.5 * np.mean(d**2)))))
+    return result
+
+
+#
+# Write the gustiness summary as a csv log, one row per period
+#
+def writeGustiness(g, filename="RadonMaster_Gustiness.csv") :
+    with open(filename, "w", encoding='utf-8') as csvFile :
+        csvFile.write("UNIX time (s),DateTime,Inches w.c.,Std,GustStd,AvgStd,Count\n")
+        for i in range(len(g["t"])) :
+            if not g["Count"][i] :
+                continue
+            csvFile.write('{0:d},{1:s},{2:.3f},{3:.4f},{4:.4f},{5:.4f},{6:d}\n'.format(
+                int(g["t"][i]), time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(g["t"][i])),
+                g["Mean"][i], g["Std"][i], g["GustStd"][i], g["AvgStd"][i], int(g["Count"][i])))
+    return filename
+
+
+#
+# Plots
+#
+def plotSpectrum(f, psd, title) :
+    fig = plt.figure()
+    ax1 = fig.add_subplot(1, 1, 1)
+    ax1.loglog(f[1:], psd[1:])
+    ax1.set_title(title)
+    ax1.set_xlabel("Frequency (Hz)")
+    ax1.set_ylabel("PSD (in.wc^2/Hz)")
+    ax1.grid(which='both')
+
+
+def plotSpectrogram(tSeg, f, psd, title) :
+    fig = plt.figure()
+    ax1 = fig.add_subplot(1, 1, 1)
+    with np.errstate(divide='ignore') :
+        db = 10.0 * np.log10(psd[:, 1:].T)
+    mesh = ax1.pcolormesh(radonMasterPlot.localDatetime64(tSeg), f[1:], db, shading='nearest')
+    fig.colorbar(mesh, ax=ax1, label="dB (in.wc^2/Hz)")
+    ax1.set_yscale('log')
+    ax1.set_title(title)
+    ax1.set_ylabel("Frequency (Hz)")
+
+    plt.gcf().autofmt_xdate()    # slant labels
+    dateFmt = mdates.DateFormatter('%Y-%m-%d %H:%M')
+    plt.gca().xaxis.set_major_formatter(dateFmt)
+
+
+def plotAllan(adev, title) :
+    fig = plt.figure()
+    ax1 = fig.add_subplot(1, 1, 1)
+    ax1.loglog([a[0] for a in adev], [a[1] for a in adev], marker='d')
+    ax1.set_title(title)
+    ax1.set_xlabel("Averaging time (s)")
+    ax1.set_ylabel("Allan deviation (in.wc)")
+    ax1.grid(which='both')
+
+
+#
+# Main
+#
+if __name__ == "__main__" :
+
+    name = sys.argv[1] if len(sys.argv) > 1 else "RadonMaster_PresSensorSec"
+    days = float(sys.argv[2]) if len(sys.argv) > 2 else 7
+
+    tStart = time.perf_counter()
+    t, x, fs = loadSeries(name, start=time.time() - days * 86400)
+    if not len(t) :
+        sys.exit("No readings in " + name)
+
+    t0, grid = uniformGrid(t, x, fs)
+    print('{0:d} readings at {1:.1f} per second over {2:.1f} hours'.format(len(t), fs, len(grid) / fs / 3600))
+
+    f, psd, n = welch(grid, fs, nperseg=min(1024, len(grid)))
+    tSeg, fSeg, psdSeg = spectrogram(t0, grid, fs, nperseg=min(int(600 * fs), len(grid)))
+    adev = allanDeviation(grid, fs)
+
+    if len(grid) >= 3600 * fs :
+        g = gustiness(t0, grid, fs)
+        print("Gustiness summary: " + writeGustiness(g))
+        radonMasterPlot.plotMultiVar(g["t"], {k: g[k] for k in ("Std", "GustStd", "AvgStd")}, 'Hourly Vacuum Gustiness (in.wc)')
+
+    print('Analysis {0:.2f} s, {1:d} Welch segments'.format(time.perf_counter() - tStart, n))
+    for s, a in adev :
+        print('  Average {0:4d} s: Allan deviation {1:.4f} in.wc'.format(s, a))
+
+    plotSpectrum(f, psd, 'Vacuum Fluctuation Spectrum')
+    if len(tSeg) > 1 :
+        plotSpectrogram(tSeg, fSeg, psdSeg, 'Vacuum Fluctuation Spectrogram')
+    plotAllan(adev, 'Vacuum Noise vs Averaging Time')
+
+    # Pause to close plots
+    plt.show(False)    # Blocks, user must close plot window
+    print("")
+    input("Press [enter] key to close plots...")
+    print("Done...")
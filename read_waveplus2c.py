@@ -27,6 +27,13 @@
 # 2020-11-30    BrucesHobbies    Added conversions for USA units
 # 2020-12-02    BrucesHobbies    Updated from python2 to python3
 #                                Changed script to callable functions
+# 2026-10-17    BrucesHobbies    Errors raise WavePlusError instead of exiting
+#                                Added WaveSession, a persistent connection with
+#                                cached characteristic handle, reconnect backoff
+#                                and a hard timeout on each read
+#                                WaveSession takes a known MAC address, reports
+#                                connect failures so the caller can rescan
+#                                Killed or failed bluepy-helper processes reaped
 
 # ===============================
 # Module import dependencies
@@ -36,6 +43,15 @@ from bluepy.btle import UUID, Peripheral, Scanner, DefaultDelegate
 import sys
 import time
 import struct
+import threading
+
+
+# ===============================
+# Errors raised to the caller
+# ===============================
+
+class WavePlusError(Exception):
+    pass
 
 
 # ====================================
@@ -86,11 +102,7 @@ class WavePlus():
                         break # exit for loop
             
             if (self.MacAddr is None):
-                print("ERROR: Could not find device.")
-                print("GUIDE: (1) Please verify the serial number.")
-                print("       (2) Ensure that the device is advertising.")
-                print("       (3) Retry connection.")
-                sys.exit(1)
+                raise WavePlusError("Could not find device {0}. Verify the serial number and that the device is advertising.".format(self.SN))
         
         # Connect to device
         if (self.periph is None):
@@ -100,13 +112,8 @@ class WavePlus():
         
     def read(self):
         if (self.curr_val_char is None):
-            print("ERROR: Devices are not connected.")
-            sys.exit(1)            
-        rawdata = self.curr_val_char.read()
-        rawdata = struct.unpack('BBBBHHHHHHHH', rawdata)
-        sensors = Sensors()
-        sensors.set(rawdata)
-        return sensors
+            raise WavePlusError("Devices are not connected.")
+        return decodeSensors(self.curr_val_char.read())
     
     def disconnect(self):
         if self.periph is not None:
@@ -114,6 +121,180 @@ class WavePlus():
             self.periph = None
             self.curr_val_char = None
 
+def stopHelper(periph):
+    # Stop the bluepy-helper of a Peripheral whose disconnect() failed, e.g. with
+    # BrokenPipeError after the helper was killed, so it is not left a zombie
+    helper = getattr(periph, '_helper', None)
+    if helper is None:
+        return
+    periph._helper = None
+    try:
+        helper.kill()
+        helper.wait()
+    except OSError:
+        pass
+    for pipe in (helper.stdin, helper.stdout, getattr(periph, '_stderr', None)):
+        if pipe is not None:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+def decodeSensors(rawdata):
+    rawdata = struct.unpack('BBBBHHHHHHHH', rawdata)
+    sensors = Sensors()
+    sensors.set(rawdata)
+    return sensors
+
+# ===============================
+# Class WaveSession
+# ===============================
+#
+# Long lived connection to one WavePlus.
+#   The link is kept up between reads and the current values characteristic
+#   handle is looked up once, so a read is one ATT request instead of a scan,
+#   connect, and service discovery. A read on a dropped link reconnects once
+#   at once; after a failed connect, reads are refused until an exponential
+#   backoff (backoffMin doubling to backoffMax seconds) has passed. Each read,
+#   including any connect, is bounded by timeout seconds: a watchdog kills the
+#   bluepy helper, which makes the blocked call raise.
+#
+#   macAddr skips the scan when the address is already known (see the
+#   find_wave2c cache). With scan=False an unknown address is an error rather
+#   than a scan inside read(). onConnectFail(SerialNumber) is called when a
+#   connect to a known address fails, so the caller can rescan in case the
+#   address has changed; setMacAddr() installs the new address.
+#
+
+WAVE_TIMEOUT     = 20.0     # seconds, hard limit on a read including connect
+WAVE_BACKOFF_MIN = 30.0     # seconds, first retry delay after a failure
+WAVE_BACKOFF_MAX = 1800.0   # seconds, retry delay limit
+
+class WaveSession():
+
+    def __init__(self, SerialNumber, timeout=WAVE_TIMEOUT, backoffMin=WAVE_BACKOFF_MIN,
+                 backoffMax=WAVE_BACKOFF_MAX, keepConnected=True, macAddr=None, scan=True, onConnectFail=None):
+        self.wave          = WavePlus(SerialNumber)
+        self.wave.MacAddr  = macAddr
+        self.scan          = scan
+        self.onConnectFail = onConnectFail
+        self.timeout       = timeout
+        self.backoffMin    = backoffMin
+        self.backoffMax    = backoffMax
+        self.keepConnected = keepConnected
+
+        self.handle        = None    # current values characteristic value handle
+        self.backoff       = backoffMin
+        self.nextAttempt   = 0.0     # time.monotonic() of next allowed connect
+
+        self.reads         = 0
+        self.connects      = 0
+        self.failures      = 0
+        self.timeouts      = 0
+
+        self.__timedOut    = False
+
+    def isConnected(self):
+        return self.wave.periph is not None
+
+    def setMacAddr(self, macAddr):
+        if macAddr != self.wave.MacAddr:
+            self.close()
+            self.wave.MacAddr = macAddr
+            self.handle       = None
+            self.nextAttempt  = 0.0  # new address, try it on the next read
+
+    def __connect(self):
+        if (self.wave.MacAddr is None):
+            if not self.scan:
+                raise WavePlusError("Address of device {0} not known yet".format(self.wave.SN))
+            self.wave.connect()      # scan for the address; connects and finds the handle too
+            periph = self.wave.periph
+            self.handle = self.wave.curr_val_char.getHandle()
+        else:
+            periph = Peripheral()
+            self.wave.periph = periph
+            try:
+                periph.connect(self.wave.MacAddr)
+            except Exception:
+                if self.onConnectFail is not None:
+                    self.onConnectFail(self.wave.SN)
+                raise
+        self.connects += 1
+        if (self.handle is None):
+            self.handle = periph.getCharacteristics(uuid=self.wave.uuid)[0].getHandle()
+
+    def __read(self):
+        if (self.wave.periph is None):
+            self.__connect()
+        rawdata = self.wave.periph.readCharacteristic(self.handle)
+        return decodeSensors(rawdata)
+
+    def __abort(self):
+        # Watchdog thread: kill the helper process so the blocked call returns
+        self.__timedOut = True
+        periph = self.wave.periph
+        helper = getattr(periph, '_helper', None)
+        if helper is not None:
+            try:
+                helper.kill()
+                helper.wait()        # reap it, pipes are closed by close()
+            except OSError:
+                pass
+
+    def close(self):
+        periph = self.wave.periph
+        try:
+            self.wave.disconnect()
+        except Exception:
+            self.wave.periph = None
+            self.wave.curr_val_char = None
+            stopHelper(periph)
+
+    def read(self):
+        now = time.monotonic()
+        if (self.wave.periph is None) and (now < self.nextAttempt):
+            raise WavePlusError("Reconnect backoff, next attempt in {0:.0f} seconds".format(self.nextAttempt - now))
+
+        self.__timedOut = False
+        watchdog = threading.Timer(self.timeout, self.__abort)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            wasConnected = self.isConnected()
+            try:
+                sensors = self.__read()
+            except Exception:
+                if not wasConnected or self.__timedOut:
+                    raise
+                self.close()                 # stale link, reconnect once now
+                sensors = self.__read()
+
+        except Exception as e:
+            watchdog.cancel()
+            self.close()
+            self.failures += 1
+            if self.__timedOut:
+                self.timeouts += 1
+            self.nextAttempt = time.monotonic() + self.backoff
+            self.backoff = min(2 * self.backoff, self.backoffMax)
+            if self.__timedOut:
+                raise WavePlusError("Timed out after {0:.0f} seconds".format(self.timeout)) from e
+            if isinstance(e, WavePlusError):
+                raise
+            raise WavePlusError(str(e)) from e
+
+        watchdog.cancel()
+        self.reads += 1
+        self.backoff = self.backoffMin
+        if not self.keepConnected:
+            self.close()
+        return sensors
+
+    def statsStr(self):
+        return 'WavePlus reads: {0:d}  connects: {1:d}  failures: {2:d}  timeouts: {3:d}'.format(
+            self.reads, self.connects, self.failures, self.timeouts)
+
 # ===================================
 # Class Sensor and sensor definitions
 # ===================================
@@ -166,9 +347,7 @@ class Sensors():
             self.sensor_data[SENSOR_IDX_CO2_LVL]              = rawData[8]*1.0
             self.sensor_data[SENSOR_IDX_VOC_LVL]              = rawData[9]*1.0
         else:
-            print("ERROR: Unknown sensor version.\n")
-            print("GUIDE: Contact Airthings for support.\n")
-            sys.exit(1)
+            raise WavePlusError("Unknown sensor version {0}. Contact Airthings for support.".format(self.sensor_version))
    
     def conv2radon(self, radon_raw):
         radon = "N/A" # Either invalid measurement, or not available
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+"""
+Copyright(C) 2026, BrucesHobbies
+All Rights Reserved
+
+AUTHOR: BrucesHobbies
+DATE: 10/17/2026
+REVISION HISTORY
+  DATE        AUTHOR          CHANGES
+  yyyy/mm/dd  --------------- -------------------------------------
+
+
+OVERVIEW:
+    Hourly and daily rollups of the averaged vacuum readings.
+
+    Each averaged reading is added to the open hourly and daily buckets
+    (count, sum, min, max, last). When a bucket closes it is published
+    through pubScribe to its own topic, for example
+    "RadonMaster/PresSensor/1h", stamped with the bucket start time. A
+    year of hourly data is under 9000 rows, so long range plots and
+    queries read kilobytes instead of the one minute log.
+
+    Recent closed buckets are also kept in memory for status messages.
+
+    A bucket open when the program stops is published with the samples
+    it has. After a restart the same bucket may be published again with
+    the rest of its samples, readers merge rows with equal bucket times
+    (see radonMasterPlot.loadRollup).
+
+LICENSE:
+    This program code and documentation are for personal private use only.
+    No commercial use of this code is allowed without prior written consent.
+
+    This program is free for you to inspect, study, and modify for your
+    personal private use.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import time
+import math
+import collections
+
+import pubScribe
+
+
+# Rollup levels: topic suffix and bucket length in seconds
+LEVELS = (("1h", 3600), ("1d", 86400))
+
+HDR = "Count,Sum,Mean,Min,Max,Last"
+
+HISTORY = 48           # closed buckets kept in memory per level
+
+
+#
+# Local time start of the bucket holding tsec
+#
+def bucketStart(tsec, period) :
+    lt = time.localtime(tsec)
+    if period >= 86400 :
+        return time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, 0, 0, 0, 0, 0, -1))
+    return time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, lt.tm_hour, 0, 0, 0, 0, -1))
+
+
+class Rollup :
+    def __init__(self, topic, suffix, period, dest=None) :
+        self.topic = topic + "/" + suffix
+        self.period = period
+        self.dest = dest if dest else [pubScribe.CSV_FILE, pubScribe.BIN_FILE]
+
+        self.history = collections.deque(maxlen=HISTORY)   # closed buckets [start, count, sum, min, max, last]
+
+        self.__start = None
+        self.__reset()
+
+
+    def __reset(self) :
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.last = math.nan
+
+
+    def add(self, value, tsec) :
+        start = bucketStart(tsec, self.period)
+        if start != self.__start :
+            self.close()
+            self.__start = start
+
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.last = value
+
+
+    # Publish the open bucket (if any samples) and start a new one
+    def close(self) :
+        if self.count :
+            bucket = [self.__start, self.count, self.sum, self.min, self.max, self.last]
+            self.history.append(bucket)
+
+            data = [self.count, round(self.sum, 3), round(self.sum / self.count, 3),
+                    round(self.min, 3), round(self.max, 3), round(self.last, 3)]
+            pubScribe.pubRecord(self.dest, self.topic, data, HDR, tsec=self.__start)
+
+        self.__reset()
+
+
+    # (count, mean, min, max) over closed and open buckets within the last seconds
+    def summary(self, seconds, now=None) :
+        if now is None :
+            now = time.time()
+
+        buckets = [b for b in self.history if b[0] >= now - seconds]
+        if self.count :
+            buckets.append([self.__start, self.count, self.sum, self.min, self.max, self.last])
+
+        count = sum(b[1] for b in buckets)
+        if not count :
+            return 0, math.nan, math.nan, math.nan
+
+        return count, sum(b[2] for b in buckets) / count, min(b[3] for b in buckets), max(b[4] for b in buckets)
+
+# end class Rollup
+
+
+#
+# All rollup levels for one topic
+#
+class Rollups :
+    def __init__(self, topic, levels=LEVELS) :
+        self.levels = [Rollup(topic, suffix, period) for suffix, period in levels]
+
+    def add(self, value, tsec) :
+        for level in self.levels :
+            level.add(value, tsec)
+
+    def close(self) :
+        for level in self.levels :
+            level.close()
+
+    def summaryStr(self, seconds=86400) :
+        count, mean, vMin, vMax = self.levels[0].summary(seconds)
+        if not count :
+            return ""
+        return 'Last {0:d} h: mean {1:.2f}  min {2:.2f}  max {3:.2f} in.wc'.format(int(seconds // 3600), mean, vMin, vMax)
+
+# end class Rollups
+
+
+#
+# Test / debug
+#
+if __name__ == '__main__':
+
+    pubScribe.connectPubScribe()
+
+    rollups = Rollups("Test/PresSensor")
+    t0 = time.time() - 3 * 86400
+    for i in range(3 * 1440) :
+        rollups.add(1.0 + 0.1 * math.sin(i / 60.0), t0 + i * 60)
+
+    print(rollups.summaryStr())
+    rollups.close()
+
+    pubScribe.disconnectPubScribe()
@@ -13,6 +13,8 @@ REVISION HISTORY
   2021/03/01  BrucesHobbies   Included cfgData.py
                               Removed key from cfg.json
                               Changed key generation
+  2026/10/17  BrucesHobbies   Added SmtpSession to reuse one SMTP login for
+                              bursts of messages, cached key and password
 
 LICENSE:
     This program code and documentation are for personal private use only. 
@@ -55,8 +57,9 @@ GENERAL INFO
   smtp.verizon.net (port 465 SSL)
 """
 
-import subprocess
+import sys
 import time
+import threading
 import smtplib
 from cryptography.fernet import Fernet
 import base64
@@ -83,53 +86,160 @@ SMTPSERVERTLSPORT = 'smtp.gmail.com:587'
 # SMTPTLSPORT = 587                   # For TLS, newer than SSL
 # SMTPSSLPORT = 465                   # For SSL
 
+SMTP_TIMEOUT = 30                     # seconds, socket timeout for connect and commands
+SMTP_IDLE_TIMEOUT = 120               # seconds an unused session is kept open (0 = close after each burst)
+
 
 FROM_USERID   = 'FROM_USERID'
 STATUS_USERID = 'STATUS_USERID'
 ALERT_USERID  = 'ALERT_USERID'
 
 
+#
+# SMTP session kept open between messages.
+#   One STARTTLS handshake and login is shared by a burst of messages. The
+#   session is checked with NOOP before reuse and reconnected once on failure.
+#   closeIfIdle() drops the connection after SMTP_IDLE_TIMEOUT seconds unused.
+#
+class SmtpSession :
+    def __init__(self, serverPort=SMTPSERVERTLSPORT, idleTimeout=SMTP_IDLE_TIMEOUT) :
+        self.serverPort = serverPort
+        self.idleTimeout = idleTimeout
+
+        self.logins = 0        # handshakes performed
+        self.sent = 0          # messages sent
+        self.errors = 0
+
+        self.__server = None
+        self.__lastUsed = 0.0
+        self.__lock = threading.Lock()
+
+
+    def __connect(self, from_UserID, passwd) :
+        server = smtplib.SMTP(self.serverPort, timeout=SMTP_TIMEOUT)
+        try :
+            server.starttls()
+            server.login(from_UserID, passwd)
+        except Exception :
+            server.close()
+            raise
+
+        self.__server = server
+        self.logins += 1
+
+        """ SSL alternative instead of TLS...
+        context = ssl.create_default_context()
+        self.__server = smtplib.SMTP_SSL(SMTPSERVER, SMTPSSLPORT, context=context, timeout=SMTP_TIMEOUT)
+        self.__server.login(from_UserID, passwd)
+        """
+
+
+    def __alive(self) :
+        try :
+            return self.__server.noop()[0] == 250
+        except Exception :
+            return False
+
+
+    def __drop(self) :
+        if self.__server is not None :
+            try :
+                self.__server.quit()    # TLS quit
+            except Exception :
+                self.__server.close()
+            self.__server = None
+
+
+    #
+    # Send [(to_UserID, fullMsg), ...] over one session
+    #
+    def send(self, from_UserID, passwd, mails) :
+        with self.__lock :
+            for to_UserID, fullMsg in mails :
+                for attempt in range(2) :
+                    try :
+                        if self.__server is None or (attempt == 0 and not self.__alive()) :
+                            self.__drop()
+                            self.__connect(from_UserID, passwd)
+
+                        self.__server.sendmail(from_UserID, to_UserID, fullMsg)
+                        self.sent += 1
+                        print("--- End of message ---")
+                        break
+
+                    except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException, OSError) as e :
+                        self.__drop()
+                        if attempt :
+                            self.errors += 1
+                            print(e)
+
+                    except Exception as e :
+                        self.__drop()
+                        self.errors += 1
+                        print(e)
+                        break
+
+            self.__lastUsed = time.monotonic()
+
+            if not self.idleTimeout :
+                self.__drop()
+
+
+    def closeIfIdle(self) :
+        with self.__lock :
+            if self.__server is not None and (time.monotonic() - self.__lastUsed) > self.idleTimeout :
+                self.__drop()
+
+
+    def close(self) :
+        with self.__lock :
+            self.__drop()
+
+# end class SmtpSession
+
+
+smtpSession = SmtpSession()
+
+
 #
 # --- Send text message ---
 #
 def send_mail(to_UserID_key, subj, msg) : 
+    send_mails([(to_UserID_key, subj, msg)])
 
-    from_UserID = cfgData[FROM_USERID]
-    passwd = password_decrypt(cfgData['token'])
-    to_UserID = cfgData[to_UserID_key]
 
-    print("Sending email on " + time.strftime("%a, %d %b %Y %H:%M:%S \n", time.localtime()))
+#
+# --- Send several messages [(to_UserID_key, subj, msg), ...] with one login ---
+#
+def send_mails(mails) :
 
-    fullMsg = 'To: ' + to_UserID + '\nFrom: ' + from_UserID + '\nSubject: ' + subj + '\n\n' + msg + '\n\n'
-    print(fullMsg)
+    from_UserID = cfgData[FROM_USERID]
+    passwd = password_cached()
 
+    outbox = []
+    for to_UserID_key, subj, msg in mails :
+        to_UserID = cfgData[to_UserID_key]
 
-    if (from_UserID!="") and (passwd!="") and (to_UserID!="") :
-        try:
-            server = smtplib.SMTP(SMTPSERVERTLSPORT)
-            server.starttls()
-            server.login(from_UserID, passwd)
-            server.sendmail(from_UserID, to_UserID, fullMsg)
-            
-            """ SSL alternative instead of TLS...
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(SMTPSERVER, SMTPSSLPORT, context=context) as server:
-                server.login(from_UserID, passwd)
-                server.sendmail(from_UserID, to_UserID, fullMsg)
-            """
+        print("Sending email on " + time.strftime("%a, %d %b %Y %H:%M:%S \n", time.localtime()))
+
+        fullMsg = 'To: ' + to_UserID + '\nFrom: ' + from_UserID + '\nSubject: ' + subj + '\n\n' + msg + '\n\n'
+        print(fullMsg)
 
-            print("--- End of message ---")
+        if (from_UserID!="") and (passwd!="") and (to_UserID!="") :
+            outbox.append((to_UserID, fullMsg))
+        else :
+            print("No userids and a password - local message only!\n")
 
-        except Exception as e:
-            print(e)
+    if outbox :
+        smtpSession.send(from_UserID, passwd, outbox)
 
-        finally:
-            server.quit()    # TLS quit
 
-    else :
-        print("No userids and a password - local message only!\n")
+def closeIdleSession() :
+    smtpSession.closeIfIdle()
 
 
+def closeSession() :
+    smtpSession.close()
 
 
 cfgData = {
@@ -141,12 +251,16 @@ cfgData = {
 
 
 fernetKey = []
+passwdCache = None     # decrypted password, memory only
 
 
 def password_key() :
-     global fernetKey
-     keyGen = bytes(subprocess.getoutput('cat /etc/machine-id'),'UTF-8')
-     fernetKey = Fernet(base64.urlsafe_b64encode(keyGen))
+    global fernetKey
+    if fernetKey :
+        return
+    with open('/etc/machine-id', 'r') as idFile :
+        keyGen = bytes(idFile.read().strip(),'UTF-8')
+    fernetKey = Fernet(base64.urlsafe_b64encode(keyGen))
 
 
 def password_encrypt(phrase) :
@@ -159,10 +273,18 @@ def password_decrypt(token) :
     return phrase.decode(encoding)
 
 
+def password_cached() :
+    global passwdCache
+    if passwdCache is None :
+        passwdCache = password_decrypt(cfgData['token']) if cfgData['token'] else ""
+    return passwdCache
+
+
 def loadJsonFile(cfgDataFileName = 'emailCfg.json') :
-    global cfgData
+    global cfgData, passwdCache
 
     password_key()
+    passwdCache = None
 
     try:
         with open(cfgDataFileName, 'r') as cfgDataFile:
@@ -213,3 +335,8 @@ if __name__ == '__main__' :
     MSG = 'Alert Message!'
     send_mail(ALERT_USERID, SUBJECT, MSG)
 
+    # Burst of messages over one session
+    send_mails([(ALERT_USERID, 'Burst 1', 'Alert Message 1'), (ALERT_USERID, 'Burst 2', 'Alert Message 2')])
+    print("Logins: ", smtpSession.logins, " Sent: ", smtpSession.sent, " Errors: ", smtpSession.errors)
+    closeSession()
+
@@ -10,6 +10,15 @@ REVISION HISTORY
   DATE        AUTHOR          CHANGES
   yyyy/mm/dd  --------------- -------------------------------------
   2021/03/01  BrucesHobbies   Fixed exception logic in readAbp()'s
+  2026/10/17  BrucesHobbies   Added readAbpRaw() and AbpCapture high rate
+                              raw capture with ring buffer and dumps
+                              Transfer function precomputed as scale and
+                              offset, readVacuumStatus() in in.wc, capture
+                              sums integer counts and decodes with NumPy
+                              I2C channel and SPI bus and chip select set per
+                              sensor, AbpCapture dump filename prefix
+                              decodeRawDump() decodes dumps with the sensor's
+                              transfer function, no bus needed to read them
 
 
 OVERVIEW:
@@ -112,12 +121,36 @@ ABPDRRV060MGSA3       ABP D RR V 060MG S A 3       "060MGS"
 
 import sys
 import time
-import smbus    # I2C support
-import spidev	# SPI support
+import array
+import json
+import struct
+import threading
+try :
+    import smbus    # I2C support
+    import spidev	# SPI support
+except ImportError :
+    smbus = spidev = None    # decoding raw dumps off the Raspberry Pi needs neither
+
+try :
+    import numpy as np    # optional, batch decode of raw captures
+except ImportError :
+    np = None
+
+
+#
+# Transfer function per Honeywell Technical Note as one multiply and add per reading:
+#   pressure = counts * presScale + presOffset
+#   vacuum in.wc (pressure sign changed) = counts * vacScale + vacOffset
+#   Returns (presScale, presOffset, vacScale, vacOffset)
+#
+def transferScale(outputMin, outputMax, pressureMin, pressureMax, conv2inchwc) :
+    presScale = (pressureMax-pressureMin) / (outputMax-outputMin)
+    presOffset = pressureMin - outputMin * presScale
+    return presScale, presOffset, -presScale * conv2inchwc, -presOffset * conv2inchwc
 
 
 class SensorHnyAbp :
-    def __init__(self, sensor) :
+    def __init__(self, sensor, i2cChannel=1, spiBus=0, spiDevice=0) :
         # ABP sensor Analog Digital Converter
         self.OUTPUT_MAX = 14745    # 2^14 counts at 90% - maximum 
         self.OUTPUT_MIN = 1638     # 2^14 counts at 10% - minimum
@@ -132,6 +165,9 @@ class SensorHnyAbp :
 
         self.i2c_address = 0x28    # ABP sensor address on the I2C bus
 
+        self.__conv2inchwc = 0.0
+        self.__setScale()
+
         print("ABP sensor: " + sensor)
 
         if len(sensor)!=6 :
@@ -176,6 +212,8 @@ class SensorHnyAbp :
         else :
             print("Error in diff|gage type!")
 
+        self.__setScale()
+
         # SPI or I2C address
         if sensor[5]=="S" :
             self.i2c_address = 0                  # i2c_address==0 indicates SPI for us
@@ -187,19 +225,19 @@ class SensorHnyAbp :
                 print("Error in i2c address!")    # self.i2c_address remains unchanged
 
         if self.i2c_address :
-            addr = " i2c address: " + hex(self.i2c_address)
+            addr = " i2c channel: " + str(i2cChannel) + " address: " + hex(self.i2c_address)
         else :
-            addr = " SPI"
+            addr = " SPI bus: " + str(spiBus) + " chip select: " + str(spiDevice)
         print("Range: " + str(round(self.PRESSURE_MIN,1)) + " to " + str(round(self.PRESSURE_MAX,1)) + " " + self.PRES_UNITS + " " + self.PRESS_SENSOR + addr)
 
         # initialize appropriate bus
         if self.i2c_address :
-            i2c_ch = 1                     # i2c channel
+            i2c_ch = i2cChannel            # i2c channel
             self.bus=smbus.SMBus(i2c_ch)   # Initialize I2C (SMBus)
         else :
             self.spi = spidev.SpiDev()     # Initialize SPI bus
-            bus = 0
-            device = 0                     # Chip select pin: Set to 0 or 1
+            bus = spiBus
+            device = spiDevice             # Chip select pin: Set to 0 or 1
 
             self.spi.open(bus, device)     # Open SPI bus
             self.spi.max_speed_hz = 500000
@@ -213,13 +251,18 @@ class SensorHnyAbp :
             self.spi.close()
 
 
+    def __setScale(self) :
+        self.presScale, self.presOffset, self.vacScale, self.vacOffset = transferScale(
+            self.OUTPUT_MIN, self.OUTPUT_MAX, self.PRESSURE_MIN, self.PRESSURE_MAX, self.__conv2inchwc)
+
+
     def __cnts2pres(self, dataBlk) :
         # converts 2 bytes to return scaled floating point
         # print("dataBlk[0]: " + hex(dataBlk[0]) + " dataBlk[1]: " + hex(dataBlk[1]))
         ans = ((dataBlk[0] & 0x003F) << 8) + (dataBlk[1] & 0x00ff)
 
         # calculation of PSI value per Honeywell Technical Note
-        return ((ans-self.OUTPUT_MIN) * (self.PRESSURE_MAX-self.PRESSURE_MIN) / (self.OUTPUT_MAX-self.OUTPUT_MIN)) + self.PRESSURE_MIN 
+        return ans * self.presScale + self.presOffset
 
 
     def __cnts2tempC(self, dataBlk) :
@@ -231,6 +274,20 @@ class SensorHnyAbp :
         return (tempC * 200.0 / 2047.0) - 50.0
 
 
+    # Pressure or vacuum in.wc from counts, e.g. the mean counts of a window
+    def counts2pres(self, counts) :
+        return counts * self.presScale + self.presOffset
+
+
+    def counts2vacuum(self, counts) :
+        return counts * self.vacScale + self.vacOffset
+
+
+    # Batch decode of raw 16 bit words (NumPy array): returns (status array, vacuum in.wc array)
+    def decodeFrames(self, raw) :
+        return raw >> 14, (raw & 0x3FFF) * self.vacScale + self.vacOffset
+
+
     def __statusDecode(statusCode) : 
         """ Status bits
             0 = normal operation, valid data
@@ -258,6 +315,31 @@ class SensorHnyAbp :
         return pressure
 
 
+    # Reads the pressure sensor returning the raw 16 bit word: status << 14 | counts, None on error
+    #   I2C reads a word (no list per read), SMBus word order is low byte first
+    def readAbpRaw(self):
+        try :
+            if self.i2c_address :
+                word = self.bus.read_word_data(self.i2c_address, 0)
+                raw = ((word & 0xFF) << 8) | (word >> 8)
+            else :
+                result = self.spi.readbytes(2)
+                raw = (result[0] << 8) | result[1]
+
+        except :
+            raw = None
+
+        return raw
+
+
+    # Reads the pressure sensor returning status and vacuum in inches water column
+    def readVacuumStatus(self):
+        raw = self.readAbpRaw()
+        if raw is None :
+            return None, None
+        return raw >> 14, (raw & 0x3FFF) * self.vacScale + self.vacOffset
+
+
     # Reads the I2C pressure sensor and also returns status
     def readAbpStatus(self):
         try :
@@ -333,6 +415,246 @@ class SensorHnyAbp :
 # end class Abp
 
 
+#
+# High rate raw capture.
+#   A background thread polls the sensor at rate readings per second into preallocated
+#   arrays (raw 16 bit words and UNIX times) used as a ring buffer of the last seconds.
+#   readAbpStatus() has the same results as SensorHnyAbp.readAbpStatus() but returns the
+#   mean of the good readings since the previous call, so the normal once per tInterval
+#   pipeline consumes decimated (averaged, anti-aliased) values. dump() writes the ring
+#   buffer to a file for gust and fan start up analysis.
+#
+#   The polling loop only stores raw words. Integer counts are summed when a tInterval
+#   is consumed, with NumPy when installed, and converted to pressure once per interval.
+#
+RAW_MAGIC = b'RMRAW001'
+RAW_FAILED = 0xFFFF    # bus error, status bits 3 (diagnostic) so never counted as good
+
+class AbpCapture :
+    def __init__(self, abp, rate=200, seconds=60, prefix="RadonMaster_AbpRaw") :
+        self.abp = abp
+        self.rate = rate
+        self.prefix = prefix
+        self.size = int(rate * seconds)
+
+        self.raw = array.array('H', bytes(2 * self.size))     # ring buffer of raw words
+        self.times = array.array('d', bytes(8 * self.size))   # ring buffer of UNIX times
+        self.head = 0                                         # readings written, next slot is head % size
+        self.__words = np.frombuffer(self.raw, dtype=np.uint16) if np else None    # NumPy view, no copy
+
+        self.errors = 0          # bus errors
+        self.overruns = 0        # polls later than one period, skipped
+
+        self.__consumed = 0      # head at the previous readAbpStatus()
+        self.__stopEvent = threading.Event()
+        self.__thread = None
+
+
+    def start(self) :
+        self.__stopEvent.clear()
+        self.__consumed = self.head
+        self.__thread = threading.Thread(target=self.__run, name="AbpCapture", daemon=True)
+        self.__thread.start()
+
+
+    def stop(self) :
+        self.__stopEvent.set()
+        if self.__thread is not None :
+            self.__thread.join()
+            self.__thread = None
+
+
+    def __run(self) :
+        # Locals for the polling loop, no attribute lookups or allocations per reading
+        period = 1.0 / self.rate
+        raw = self.raw
+        times = self.times
+        size = self.size
+        readRaw = self.abp.readAbpRaw
+        wallClock = time.time
+        monotonic = time.monotonic
+        sleep = time.sleep
+        stopped = self.__stopEvent.is_set
+
+        head = self.head
+        i = head % size
+        deadline = monotonic()
+
+        while not stopped() :
+            value = readRaw()
+            if value is None :
+                value = RAW_FAILED
+                self.errors += 1
+
+            raw[i] = value
+            times[i] = wallClock()
+            head += 1
+            self.head = head    # single writer, slot is complete before it is published
+            i += 1
+            if i == size :
+                i = 0
+
+            deadline += period
+            delay = deadline - monotonic()
+            if delay > 0 :
+                sleep(delay)
+            elif delay < -period :
+                skip = int(-delay // period)
+                deadline += skip * period
+                self.overruns += skip
+
+
+    # Index range of readings still in the ring buffer, from start
+    def __range(self, start) :
+        head = self.head
+        return max(start, head - self.size), head
+
+
+    # Ring buffer slices [(a, b), ...] holding readings start to head
+    def __slices(self, start, head) :
+        if head <= start :
+            return []
+        a, b = start % self.size, head % self.size
+        if b > a :
+            return [(a, b)]
+        return [(a, self.size), (0, b)]
+
+
+    # Sum of good (status 0) counts and their number, the last status, since the previous call
+    def __consume(self) :
+        start, head = self.__range(self.__consumed)
+        self.__consumed = head
+
+        total = 0
+        n = 0
+        status = None
+        for a, b in self.__slices(start, head) :
+            if self.__words is not None :
+                words = self.__words[a:b]
+                good = words[(words >> 14) == 0]
+                total += int(good.sum(dtype=np.uint64))
+                n += len(good)
+                status = int(words[-1]) >> 14
+            else :
+                for value in self.raw[a:b] :
+                    status = value >> 14
+                    if status == 0 :
+                        total += value & 0x3FFF
+                        n += 1
+
+        return total, n, status
+
+
+    # Mean of the good readings since the previous call: (status, pressure) as SensorHnyAbp
+    def readAbpStatus(self) :
+        total, n, status = self.__consume()
+        if n :
+            return 0, self.abp.counts2pres(total / n)
+        return status, None
+
+
+    # Mean of the good readings since the previous call: (status, vacuum in.wc)
+    def readVacuumStatus(self) :
+        total, n, status = self.__consume()
+        if n :
+            return 0, self.abp.counts2vacuum(total / n)
+        return status, None
+
+
+    # Last seconds (all if None) of readings as NumPy arrays: (times, status, vacuum in.wc)
+    def frames(self, seconds=None) :
+        start, head = self.__range(0)
+        if seconds is not None :
+            start = max(start, head - int(seconds * self.rate))
+
+        times = np.frombuffer(self.times, dtype=np.float64)
+        parts = self.__slices(start, head)
+        t = np.concatenate([times[a:b] for a, b in parts] or [np.zeros(0)])
+        raw = np.concatenate([self.__words[a:b] for a, b in parts] or [np.zeros(0, dtype=np.uint16)])
+        status, vacuum = self.abp.decodeFrames(raw)
+        return t, status, vacuum
+
+
+    # Readings per second achieved over the buffer
+    def achievedRate(self) :
+        start, head = self.__range(0)
+        if head - start < 2 :
+            return 0.0
+        dt = self.times[(head-1) % self.size] - self.times[start % self.size]
+        return (head - start - 1) / dt if dt > 0 else 0.0
+
+
+    def statsStr(self) :
+        return 'Capture: {0:.0f} readings/s, {1:d} errors, {2:d} overruns'.format(
+            self.achievedRate(), self.errors, self.overruns)
+
+
+    # Write the last seconds (all if None) of raw readings. Returns the filename.
+    #   File: RAW_MAGIC, uint32 info length, JSON info, float64 times, uint16 raw words
+    def dump(self, filename=None, seconds=None) :
+        start, head = self.__range(0)
+        if seconds is not None :
+            start = max(start, head - int(seconds * self.rate))
+
+        times = array.array('d')
+        raw = array.array('H')
+        for a, b in self.__slices(start, head) :
+            times += self.times[a:b]
+            raw += self.raw[a:b]
+
+        if filename is None :
+            filename = time.strftime(self.prefix + "_%Y%m%d-%H%M%S.bin", time.localtime(times[-1] if len(times) else time.time()))
+
+        info = json.dumps({"rate": self.rate, "count": len(raw), "units": self.abp.PRES_UNITS,
+                           "outputMin": self.abp.OUTPUT_MIN, "outputMax": self.abp.OUTPUT_MAX,
+                           "pressureMin": self.abp.PRESSURE_MIN, "pressureMax": self.abp.PRESSURE_MAX,
+                           "inwc": self.abp.pres2inwc(1.0)}).encode('utf-8')
+
+        with open(filename, "wb") as rawFile :
+            rawFile.write(RAW_MAGIC + struct.pack('<I', len(info)) + info)
+            times.tofile(rawFile)
+            raw.tofile(rawFile)
+
+        return filename
+
+# end class AbpCapture
+
+
+#
+# Read a file written by AbpCapture.dump(): returns (info dict, times array, raw array)
+#
+def readRawDump(filename) :
+    with open(filename, "rb") as rawFile :
+        if rawFile.read(len(RAW_MAGIC)) != RAW_MAGIC :
+            raise ValueError("Not a raw capture file: " + filename)
+
+        n, = struct.unpack('<I', rawFile.read(4))
+        info = json.loads(rawFile.read(n).decode('utf-8'))
+
+        times = array.array('d')
+        times.fromfile(rawFile, info["count"])
+        raw = array.array('H')
+        raw.fromfile(rawFile, info["count"])
+
+    return info, times, raw
+
+
+#
+# Decode a raw dump with the transfer function of the sensor that wrote it (NumPy).
+#   Returns (info dict, times array, status array, vacuum in.wc array)
+#
+def decodeRawDump(filename) :
+    if np is None :
+        raise ImportError("numpy is required to decode " + filename + " (sudo pip3 install numpy)")
+
+    info, times, raw = readRawDump(filename)
+    presScale, presOffset, vacScale, vacOffset = transferScale(
+        info["outputMin"], info["outputMax"], info["pressureMin"], info["pressureMax"], info["inwc"])
+
+    raw = np.frombuffer(raw, dtype=np.uint16)
+    return info, np.frombuffer(times, dtype=np.float64), raw >> 14, (raw & 0x3FFF) * vacScale + vacOffset
+
+
 
 if __name__ == '__main__':
     print("Press CTRL+C to exit...")
@@ -341,6 +663,20 @@ if __name__ == '__main__':
         abp = SensorHnyAbp("060MG2")    # 0 to 60 mbar gage I2C
         # abp = SensorHnyAbp("001PDS")    # -1 to +1 psi diff SPI
 
+        if len(sys.argv) > 1 and sys.argv[1] == "capture" :
+            capture = AbpCapture(abp, rate=500, seconds=10)
+            capture.start()
+            time.sleep(10)
+            capture.stop()
+            print(capture.statsStr())
+            print(capture.readVacuumStatus())
+            if np :
+                t, status, vacuum = capture.frames()
+                print('{0:d} readings, vacuum mean {1:.3f} std {2:.4f} in.wc'.format(
+                    len(t), vacuum[status == 0].mean(), vacuum[status == 0].std()))
+            print("Raw readings: " + capture.dump())
+            sys.exit(0)
+
         while True:
             """
             result = abp.readAbp()
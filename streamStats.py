@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+"""
+Copyright(C) 2026, BrucesHobbies
+All Rights Reserved
+
+AUTHOR: BrucesHobbies
+DATE: 10/17/2026
+REVISION HISTORY
+  DATE        AUTHOR          CHANGES
+  yyyy/mm/dd  --------------- -------------------------------------
+  2026/10/17  BrucesHobbies   Added merge() and SlidingWindow
+
+
+OVERVIEW:
+    Streaming statistics over an averaging window.
+
+    Each sensor read updates the count, mean, sum of squared deviations
+    (Welford's method), min, and max in constant time and memory. Unlike
+    a running sum and sum of squares, Welford's update does not lose
+    precision when the variance is small compared to the mean, which is
+    the normal case for a steady fan vacuum.
+
+    Failed reads are counted so a window with a flaky sensor can be told
+    apart from a quiet one.
+
+    SlidingWindow keeps one WindowStats per step and combines them (Chan's
+    parallel merge) into statistics over the last length seconds each time
+    a step closes. With step equal to length it is a tumbling window.
+
+LICENSE:
+    This program code and documentation are for personal private use only.
+    No commercial use of this code is allowed without prior written consent.
+
+    This program is free for you to inspect, study, and modify for your
+    personal private use.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import math
+import collections
+
+
+# Column names matching values()
+HDR = "Inches w.c.,Std,Min,Max,Valid,Failed"
+
+
+class WindowStats :
+    def __init__(self) :
+        self.reset()
+
+
+    def reset(self) :
+        self.nValid = 0          # good reads in window
+        self.nFail = 0           # failed reads in window
+        self.mean = 0.0
+        self.m2 = 0.0            # sum of squared deviations from the mean
+        self.min = math.inf
+        self.max = -math.inf
+
+
+    def add(self, x) :
+        self.nValid += 1
+        delta = x - self.mean
+        self.mean += delta / self.nValid
+        self.m2 += delta * (x - self.mean)
+
+        if x < self.min :
+            self.min = x
+        if x > self.max :
+            self.max = x
+
+
+    def fail(self) :
+        self.nFail += 1
+
+
+    # Combine another window's statistics into this one
+    def merge(self, other) :
+        n = self.nValid + other.nValid
+        if other.nValid :
+            delta = other.mean - self.mean
+            self.mean += delta * other.nValid / n
+            self.m2 += other.m2 + delta * delta * self.nValid * other.nValid / n
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+
+        self.nValid = n
+        self.nFail += other.nFail
+
+
+    # Sample standard deviation
+    def std(self) :
+        if self.nValid < 2 :
+            return 0.0
+        return math.sqrt(self.m2 / (self.nValid - 1))
+
+
+    # Fraction of reads in the window that failed
+    def failRate(self) :
+        n = self.nValid + self.nFail
+        if not n :
+            return 0.0
+        return self.nFail / n
+
+
+    # Log columns, see HDR
+    def values(self, digits=3) :
+        if not self.nValid :
+            return [math.nan, math.nan, math.nan, math.nan, 0, self.nFail]
+        return [round(self.mean, digits), round(self.std(), digits), round(self.min, digits),
+                round(self.max, digits), self.nValid, self.nFail]
+
+
+    def __str__(self) :
+        return 'mean {0:.2f}  std {1:.3f}  min {2:.2f}  max {3:.2f}  reads {4:d}/{5:d}'.format(
+            self.mean, self.std(), self.min, self.max, self.nValid, self.nValid + self.nFail)
+
+# end class WindowStats
+
+
+#
+# Statistics over the last length seconds, evaluated each time a step of step seconds
+#   closes. add() and fail() return the window's WindowStats when the sample starts a
+#   new step, otherwise None. Steps without reads (dropped ticks) are counted as empty.
+#
+class SlidingWindow :
+    def __init__(self, length, step) :
+        self.length = length
+        self.step = step
+        self.steps = collections.deque(maxlen=max(1, int(round(length / step))))
+
+        self.__current = WindowStats()
+        self.__index = None
+
+
+    def __advance(self, tsec) :
+        index = int(tsec // self.step)
+        closed = None
+
+        if self.__index is not None and index != self.__index :
+            self.steps.append(self.__current)
+            for i in range(min(index - self.__index - 1, self.steps.maxlen)) :
+                self.steps.append(WindowStats())
+
+            if len(self.steps) == self.steps.maxlen :
+                closed = self.stats()
+            self.__current = WindowStats()
+
+        self.__index = index
+        return closed
+
+
+    def add(self, x, tsec) :
+        closed = self.__advance(tsec)
+        self.__current.add(x)
+        return closed
+
+
+    def fail(self, tsec) :
+        closed = self.__advance(tsec)
+        self.__current.fail()
+        return closed
+
+
+    # Merged statistics of the closed steps
+    def stats(self) :
+        total = WindowStats()
+        for s in self.steps :
+            total.merge(s)
+        return total
+
+# end class SlidingWindow
+
+
+#
+# Test / debug
+#
+if __name__ == '__main__':
+
+    import random
+
+    stats = WindowStats()
+    for i in range(60) :
+        if i % 20 == 0 :
+            stats.fail()
+        else :
+            stats.add(1.0e6 + random.gauss(0.8, 0.05))    # large offset, small spread
+
+    print(stats)
+    print(HDR)
+    print(stats.values())
+
+    # 15 minute window sliding each minute over 1 Hz readings with a step change
+    drift = SlidingWindow(900, 60)
+    for t in range(1800) :
+        closed = drift.add(1.0 if t < 1200 else 0.8, t)
+        if closed :
+            print(t, closed)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""
+Copyright(C) 2026, BrucesHobbies
+All Rights Reserved
+
+AUTHOR: BrucesHobbies
+DATE: 10/17/2026
+
+OVERVIEW:
+    pubScribe checks that need no broker or email account.
+    Run from the repository folder:  python3 -m unittest discover tests
+"""
+
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pubScribe
+
+
+TOPIC = "RadonMaster/Alert/Test"
+
+
+class TestAlertDigest(unittest.TestCase) :
+
+    # Two copies of one alert, differing only in time and reading, are one entry with count 2
+    def testRepeatMerged(self) :
+        digest = pubScribe.AlertDigest()
+        digest.add(TOPIC, pubScribe.WARNING, "Alert Sat, 2026-Oct-17, 10:00:00 Vacuum:    1.71 in.wc\nAlert: vacuum drift low (15 min average).", 1000)
+        digest.add(TOPIC, pubScribe.WARNING, "Alert Sat, 2026-Oct-17, 10:05:00 Vacuum:    1.69 in.wc\nAlert: vacuum drift low (15 min average).", 1300)
+
+        self.assertEqual(digest.pending(), 1)
+        self.assertEqual(digest.merged, 1)
+
+        subj, body = digest.take()
+        self.assertEqual(subj, "Alert digest (2 alerts)")
+        self.assertIn("x2", body)
+        self.assertIn("1.69 in.wc", body)        # latest message
+        self.assertNotIn("Reasons:", body)
+        self.assertEqual(digest.pending(), 0)
+
+    # Different alerts on one topic and severity are merged, each reason is kept
+    def testDistinctReasonsKept(self) :
+        digest = pubScribe.AlertDigest(maxReasons=2)
+        digest.add(TOPIC, pubScribe.WARNING, "Alert 10:00 Vacuum: 1.71\nAlert: vacuum drift low (15 min average).", 1000)
+        digest.add(TOPIC, pubScribe.WARNING, "Alert 10:01 Vacuum: 1.70\nAlert: vacuum step change down.", 1060)
+        digest.add(TOPIC, pubScribe.WARNING, "Alert 10:02 Vacuum: 2.60\nAlert: vacuum delta high.", 1120)
+        digest.add("RadonMaster/Alert/Other", pubScribe.WARNING, "Alert 10:03 Vacuum: 2.60\nAlert: vacuum delta high.", 1180)
+
+        self.assertEqual(digest.pending(), 2)
+        subj, body = digest.take()
+        self.assertEqual(subj, "Alert digest (4 alerts)")
+        self.assertIn("x3", body)
+        self.assertIn("drift low", body)
+        self.assertIn("step change down", body)
+
+
+if __name__ == '__main__' :
+    unittest.main()
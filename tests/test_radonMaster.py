@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+"""
+Copyright(C) 2026, BrucesHobbies
+All Rights Reserved
+
+AUTHOR: BrucesHobbies
+DATE: 10/17/2026
+
+OVERVIEW:
+    Alert algorithm checks with simulated readings, no sensor required.
+    Run from the repository folder:  python3 -m unittest discover tests
+"""
+
+
+import io
+import os
+import sys
+import contextlib
+import types
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Bus modules are only on the Raspberry Pi, radonMaster opens its sensors at import
+for busModule, busClass in (("smbus", "SMBus"), ("spidev", "SpiDev")) :
+    try :
+        __import__(busModule)
+    except ImportError :
+        fake = types.ModuleType(busModule)
+        setattr(fake, busClass, lambda *args : types.SimpleNamespace(open=lambda *a : None, close=lambda : None))
+        sys.modules[busModule] = fake
+
+import radonMaster
+
+
+SIGMA = 0.02           # reading noise, inches water column
+
+
+def calibratedChannel(level) :
+    ch = radonMaster.VacuumChannel({"name": "Test", "sensor": "060MG2"}, 0)
+    ch.pFiltered = level
+    ch.calCount = 0
+    ch.readSigma = SIGMA
+    return ch
+
+
+#
+# Feed one reading per second, minute averages to radonAlg() as myTimer does.
+#   level(minute) is the true vacuum. Returns the number of step alerts started.
+#
+def run(ch, minutes, level, rng) :
+    steps = 0
+    for minute in range(minutes) :
+        stats = radonMaster.streamStats.WindowStats()
+        for i in range(60) :
+            vacuum = level(minute) + rng.gauss(0, SIGMA)
+            stats.add(vacuum)
+            prevAlg = ch.windowAlerts[radonMaster.STEP_DETECT]
+            sAlg, severity = ch.radonAlgStep(vacuum)
+            if sAlg and sAlg != prevAlg :
+                steps += 1
+        ch.radonAlg(stats.mean, stats)
+    return steps
+
+
+class TestStepAndBaseline(unittest.TestCase) :
+
+    # 0.3 in.wc decline over 30 days: the baseline follows, no step alarm is left set
+    def testSustainedDrift(self) :
+        days = 30
+        minutes = days * 1440
+        ch = calibratedChannel(2.0)
+
+        steps = run(ch, minutes, lambda m : 2.0 - 0.3 * m / minutes, random.Random(1))
+
+        self.assertEqual(ch.windowAlerts[radonMaster.STEP_DETECT], "")
+        self.assertLessEqual(steps, 1)
+        lag = radonMaster.baselineTimeConst * 0.3 / minutes    # EWMA lag behind a ramp
+        self.assertAlmostEqual(ch.pFiltered, 1.7 + lag, delta=0.02)
+
+    # A 3 std step is alerted once, then the alarm clears as the reference adapts
+    def testStep(self) :
+        ch = calibratedChannel(2.0)
+        rng = random.Random(2)
+
+        self.assertEqual(run(ch, 60, lambda m : 2.0, rng), 0)
+        self.assertEqual(run(ch, 1, lambda m : 2.0 - 3 * SIGMA, rng), 1)
+        self.assertEqual(run(ch, 600, lambda m : 2.0 - 3 * SIGMA, rng), 0)
+        self.assertEqual(ch.windowAlerts[radonMaster.STEP_DETECT], "")
+
+
+#
+# Readings through VacuumChannel.process() as myTimer feeds them, one per second.
+#   EMAIL_SMS records are collected instead of sent, other records are dropped.
+#
+class TestAlertThrottle(unittest.TestCase) :
+
+    def setUp(self) :
+        self.sent = []
+        self.saved = (radonMaster.pubScribe.pubRecord, radonMaster.saveState, radonMaster.cusumEnabled)
+
+        def pubRecord(dest, topic, data, hdr="", severity=radonMaster.pubScribe.WARNING, tsec=None) :
+            if dest == radonMaster.pubScribe.EMAIL_SMS :
+                self.sent.append((self.tWall, severity, data.split("\n")[1]))
+
+        radonMaster.pubScribe.pubRecord = pubRecord
+        radonMaster.saveState = lambda : None
+
+        self.ch = calibratedChannel(2.0)
+        self.ch.recorder = None
+        self.rng = random.Random(3)
+        self.tWall = 1700000000
+
+
+    def tearDown(self) :
+        radonMaster.pubScribe.pubRecord, radonMaster.saveState, radonMaster.cusumEnabled = self.saved
+
+
+    def feed(self, seconds, level) :
+        with contextlib.redirect_stdout(io.StringIO()) :
+            for i in range(seconds) :
+                self.tWall += 1
+                self.ch.process(self.tWall, 0, level + self.rng.gauss(0, SIGMA), self.tWall % 60 == 0)
+
+
+    def criticalAfter(self, tsec) :
+        return [t - tsec for t, severity, msg in self.sent if severity == radonMaster.pubScribe.CRITICAL and t >= tsec]
+
+
+    # Drift alert first, the fast window must still alert CRITICAL when the fan dies
+    def testDriftThenFanDies(self) :
+        radonMaster.cusumEnabled = 0
+        self.feed(20 * 60, 2.0 - 1.5 * radonMaster.driftDeltaLow)
+        self.assertTrue(any("drift low" in msg for t, severity, msg in self.sent))
+
+        tDead = self.tWall
+        self.feed(30, 0.02)
+        self.assertTrue(self.criticalAfter(tDead))
+        self.assertLessEqual(min(self.criticalAfter(tDead)), 2 * radonMaster.fastWindow)
+
+
+    # Step to zero: the step alert must not hold back the CRITICAL fast and average alerts
+    def testStepToZero(self) :
+        self.feed(10 * 60, 2.0)
+        self.assertEqual(self.sent, [])
+
+        tDead = self.tWall
+        self.feed(3 * 60, 0.02)
+        self.assertTrue(any("step change down" in msg for t, severity, msg in self.sent))
+        self.assertTrue(self.criticalAfter(tDead))
+        self.assertLessEqual(min(self.criticalAfter(tDead)), 2 * radonMaster.fastWindow)
+        self.assertTrue(any("delta low" in msg for t, severity, msg in self.sent if severity == radonMaster.pubScribe.CRITICAL))
+
+
+if __name__ == '__main__' :
+    unittest.main()
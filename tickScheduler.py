@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+"""
+Copyright(C) 2026, BrucesHobbies
+All Rights Reserved
+
+AUTHOR: BrucesHobbies
+DATE: 10/17/2026
+REVISION HISTORY
+  DATE        AUTHOR          CHANGES
+  yyyy/mm/dd  --------------- -------------------------------------
+
+
+OVERVIEW:
+    Drift free periodic scheduler for the sampling loop.
+
+    A single long lived thread waits on deadlines computed from
+    time.monotonic(), so a slow tick (SMTP send, BLE read) never causes
+    two ticks to run at the same time and a wall clock step from NTP
+    never skips or repeats a tick. Each tick is handed its nominal wall
+    clock time (start time + n * interval) which the caller uses for
+    minute, quarter hour, and status message boundaries.
+
+    When a tick runs long, the missed deadlines are run back to back
+    (late) up to maxCatchUp ticks, any older missed ticks are dropped.
+    Counts of late and dropped ticks are kept for the status message.
+
+LICENSE:
+    This program code and documentation are for personal private use only.
+    No commercial use of this code is allowed without prior written consent.
+
+    This program is free for you to inspect, study, and modify for your
+    personal private use.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, version 3 of the License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import time
+import math
+import threading
+import traceback
+
+
+class TickScheduler :
+    def __init__(self, interval, callback, maxCatchUp=2, lateTolerance=0.25, resyncLimit=2.0) :
+        self.interval = interval          # seconds between ticks
+        self.callback = callback          # callback(tickNum, tWall)
+        self.maxCatchUp = maxCatchUp      # missed ticks run back to back before dropping
+        self.lateTolerance = lateTolerance * interval    # seconds after deadline before a tick counts as late
+        self.resyncLimit = max(resyncLimit, interval)    # seconds wall clock may step before re-anchoring
+
+        self.ticks = 0                    # ticks run
+        self.late = 0                     # ticks run after their deadline + lateTolerance
+        self.dropped = 0                  # ticks skipped while catching up
+        self.resyncs = 0                  # wall clock steps detected (NTP)
+        self.maxLag = 0.0                 # worst lag seen in seconds
+
+        self.__stopEvent = threading.Event()
+        self.__thread = None
+        self.__wallBase = 0.0
+        self.__monoBase = 0.0
+
+
+    def start(self) :
+        # first tick is aligned to an interval boundary within the minute
+        wall = time.time()
+        mono = time.monotonic()
+        first = (math.floor(wall / self.interval) + 1) * self.interval
+
+        self.__wallBase = first
+        self.__monoBase = mono + (first - wall)
+
+        self.__stopEvent.clear()
+        self.__thread = threading.Thread(target=self.__run, name="TickScheduler", daemon=True)
+        self.__thread.start()
+
+
+    def stop(self, timeout=None) :
+        self.__stopEvent.set()
+        if self.__thread is not None :
+            self.__thread.join(timeout)
+            self.__thread = None
+
+
+    def stats(self) :
+        return {"Ticks": self.ticks, "Late": self.late, "Dropped": self.dropped,
+                "Resyncs": self.resyncs, "MaxLag": round(self.maxLag, 3)}
+
+
+    def statsStr(self) :
+        return 'Scheduler: {0:d} ticks, {1:d} late, {2:d} dropped, {3:d} resyncs, max lag {4:.3f} s'.format(
+            self.ticks, self.late, self.dropped, self.resyncs, self.maxLag)
+
+
+    def __resync(self) :
+        # Re-anchor nominal wall time by whole intervals if the wall clock was stepped
+        diff = (time.time() - time.monotonic()) - (self.__wallBase - self.__monoBase)
+        if abs(diff) > self.resyncLimit :
+            step = round(diff / self.interval) * self.interval
+            self.__wallBase += step
+            self.__monoBase += step - diff    # keep deadlines on the new wall clock grid
+            self.resyncs += 1
+
+
+    def __run(self) :
+        n = 0
+
+        while not self.__stopEvent.is_set() :
+            deadline = self.__monoBase + n * self.interval
+            delay = deadline - time.monotonic()
+
+            if delay > 0 :
+                if self.__stopEvent.wait(delay) :
+                    break
+
+            else :
+                lag = -delay
+                self.maxLag = max(self.maxLag, lag)
+
+                # Ticks after this one whose deadlines have also passed
+                missed = int(lag // self.interval)
+                if missed > self.maxCatchUp :
+                    skip = missed - self.maxCatchUp
+                    n = n + skip
+                    self.dropped += skip
+
+                if lag > self.lateTolerance :
+                    self.late += 1
+
+            self.__resync()
+
+            try :
+                self.callback(n, self.__wallBase + n * self.interval)
+            except Exception :
+                print("TickScheduler: exception in tick " + str(n))
+                traceback.print_exc()
+
+            self.ticks += 1
+            n = n + 1
+
+# end class TickScheduler
+
+
+#
+# Crossing of a period boundary (with offset) between two wall times.
+#   Used instead of t.second==0 tests so a dropped tick never loses a boundary.
+#
+def boundaryCrossed(tPrev, tNow, period, offset=0) :
+    return ((tNow - offset) // period) != ((tPrev - offset) // period)
+
+
+#
+# Test / debug
+#
+if __name__ == '__main__':
+
+    print("\nPress CTRL+C to exit...\n")
+
+    def tick(n, tWall) :
+        print(n, time.strftime("%H:%M:%S", time.localtime(tWall)), round(time.time() - tWall, 3))
+        if n == 3 :
+            time.sleep(3.5)    # simulate a slow tick (SMTP send)
+
+    scheduler = TickScheduler(1, tick)
+    scheduler.start()
+
+    try :
+        while True :
+            time.sleep(1)
+
+    except KeyboardInterrupt :
+        scheduler.stop()
+
+    print(scheduler.statsStr())
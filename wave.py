@@ -17,6 +17,17 @@ REVISION HISTORY
   2021/03/01  BrucesHobbies   Modified for pubScribe.py
   2021/03/24  BrucesHobbies   Added MP4725 DAC output option
   2021/04/01  BrucesHobbies   Changed wavePlus alert message format
+  2026/10/17  BrucesHobbies   Readings also published to BIN_FILE
+                              Alert throttle times saved and restored
+                              Reads over a persistent WaveSession connection
+                              No scan at import, MAC address from the
+                              find_wave2c cache or a background scan
+                              Reads run on a BLE worker thread, results are
+                              collected with pollResults()
+                              Several WavePlus devices: registry by serial
+                              number, one shared scan, reads in parallel up
+                              to the adapter connection limit, log topic and
+                              alert throttling per device
 
 
 OVERVIEW:
@@ -57,8 +68,11 @@ LICENSE:
 import sys
 import time
 import os
+import threading
+import queue
 
 import pubScribe
+import streamStats
 
 MCP4725_ENABLED = 0
 
@@ -70,7 +84,11 @@ if MCP4725_ENABLED :
     # dac.bus=smbus.SMBus(i2c_ch)   # Initialize I2C (SMBus)
 
 
-SerialNumber = 0
+SerialNumbers = []         # WavePlus serial numbers to read, [] = every WavePlus found
+deviceNames = {}           # optional log topic names, e.g. {2930001234: "Basement"}
+FAN_DEVICE = 0             # serial number driving the MCP4725 fan output, 0 = first device
+
+MAX_CONNECTIONS = 3        # concurrent BLE links the adapter allows (reads run in parallel up to this)
 
 SamplePeriod = 60          # 60 Seconds, only used when run as main()
 
@@ -79,14 +97,15 @@ MODE='terminal'
 LOGGING_ENABLED = 1
 
 #
-# find_wave and read_waveplus both require bluepy, SerialNumber==0 indicates bluepy lib or wave not found
+# find_wave and read_waveplus both require bluepy. Nothing is scanned at import:
+# serial numbers and MAC addresses come from the find_wave2c cache, or from a
+# background scan started by startDiscovery(). No devices means no wave yet.
 # 
 import find_wave2c
-if not SerialNumber :
-    SerialNumber = find_wave2c.findWave()
 
-# If SerialNumber == 0 then don't attempt to read_waveplus
-if SerialNumber :
+macAddrs = find_wave2c.loadCache()     # serial number to MAC address
+
+if find_wave2c.bluePyFound :
     import read_waveplus2c
 
 
@@ -140,6 +159,26 @@ humidityAlertTime = [0] * 3
 THROTTLE_TIME = 24*60*60    # once a day in seconds
 
 
+#
+# Alert throttle times, one set per device. The lists above are the defaults
+# for sensor2StringUnits() when no device set is given.
+#
+alertTimes = {"radon": radonAlertTime, "voc": vocAlertTime, "co2": co2AlertTime,
+              "temp": tempAlertTime, "humidity": humidityAlertTime}
+
+def newAlertTimes() :
+    return {name: [0] * len(times) for name, times in alertTimes.items()}
+
+def copyAlertTimes(times) :
+    return {name: list(t) for name, t in times.items()}
+
+def setAlertTimes(times, saved) :
+    for name, t in times.items() :
+        s = saved.get(name)
+        if isinstance(s, list) and len(s) == len(t) :    # brackets unchanged
+            t[:] = s
+
+
 def compareValue(value, brackets) :
     result = ""
 
@@ -166,8 +205,14 @@ def compareRH(percentage) :
     return i, result
 
 
-def sensor2StringUnits(sensors) :
-    global radonAlertTime, vocAlertTime, co2AlertTime, tempAlertTime, humidityAlertTime
+def sensor2StringUnits(sensors, times=None) :
+    if times is None :
+        times = alertTimes
+    radonAlertTime = times["radon"]
+    vocAlertTime = times["voc"]
+    co2AlertTime = times["co2"]
+    tempAlertTime = times["temp"]
+    humidityAlertTime = times["humidity"]
 
     alert = 0
     tsec = time.time()
@@ -262,12 +307,191 @@ def sensor2StringUnits(sensors) :
 hdrRow = ""
 
 
+#
+# One WavePlus: session, log topic, alert throttling, and read statistics
+#
+class WaveDevice :
+    def __init__(self, serialNumber, name="") :
+        self.serialNumber = serialNumber
+        self.name = name
+        self.topic = "RadonMaster/WavePlus" + ("/" + name if name else "")
+        self.alertTimes = newAlertTimes()
+        self.session = None
+
+        self.pending = threading.Event()      # read queued or in progress
+        self.latency = streamStats.WindowStats()   # seconds per read, failed reads counted
+        self.late = 0              # requests dropped, deadline passed before the read started
+        self.skipped = 0           # requests made while a read was still pending
+        self.errors = 0            # unexpected exceptions, for example a bad sensor value
+
+
+    def label(self) :
+        return self.name if self.name else str(self.serialNumber)
+
+
+    def ready(self) :
+        return self.serialNumber in macAddrs
+
+
+    # Returns results, alert or raises read_waveplus2c.WavePlusError
+    def read(self) :
+        macAddr = macAddrs[self.serialNumber]
+        if self.session is None :
+            self.session = read_waveplus2c.WaveSession(self.serialNumber, macAddr=macAddr, scan=False,
+                                                       onConnectFail=startDiscovery)
+        self.session.setMacAddr(macAddr)                 # rescanned address, if changed
+        self.session.keepConnected = len(devices) <= MAX_CONNECTIONS    # else free the link for others
+
+        sensors = self.session.read()
+
+        data, wavePlusString, alert = sensor2StringUnits(sensors, self.alertTimes)
+        hdr = hdrRow
+
+        if MCP4725_ENABLED and self is fanDevice() :
+            fanValue = round(dac.alg(data),3)
+            # print("FanValue: ", fanValue)
+            data.append(fanValue)
+            wavePlusString.append('Fan value   : {0:7.2f}    '.format(fanValue))
+            hdr += ",Fan"
+
+        if LOGGING_ENABLED :
+            pubScribe.pubRecord([pubScribe.CSV_FILE, pubScribe.BIN_FILE], self.topic, data, hdr)
+
+        results = ""
+        if len(devices) > 1 :
+            results = "WavePlus " + self.label() + "\n"
+        for item in wavePlusString :
+            results += item + "\n"
+
+        return results, alert
+
+
+    def statsStr(self) :
+        s = self.session.statsStr() if self.session else ""
+        if self.latency.nValid + self.latency.nFail :
+            s = s + "\n" + 'WavePlus read seconds: mean {0:.2f}  max {1:.2f}  ok {2:d}  failed {3:d}  late {4:d}  skipped {5:d}  errors {6:d}'.format(
+                self.latency.mean, max(self.latency.max, 0.0), self.latency.nValid, self.latency.nFail, self.late, self.skipped, self.errors)
+        if s and len(devices) > 1 :
+            s = self.label() + " " + s
+        return s
+
+# end class WaveDevice
+
+
+#
+# Device registry by serial number, in registration order
+#   Configured SerialNumbers are registered at import, or with none configured
+#   every WavePlus in the cache and every one found by a scan. The first device
+#   without a name logs to RadonMaster/WavePlus, later ones are named by serial
+#   number unless given a name in deviceNames.
+#
+devices = {}
+registryLock = threading.Lock()
+savedAlertTimes = {}       # restored alert times of devices not registered yet
+
+
+def register(serialNumber) :
+    with registryLock :
+        if serialNumber in devices :
+            return devices[serialNumber]
+
+        name = deviceNames.get(serialNumber, "")
+        if not name and any(not d.name for d in devices.values()) :
+            name = str(serialNumber)
+
+        device = WaveDevice(serialNumber, name)
+        setAlertTimes(device.alertTimes, savedAlertTimes.pop(str(serialNumber), {}))
+        devices[serialNumber] = device
+        return device
+
+
+def fanDevice() :
+    if FAN_DEVICE :
+        return devices.get(FAN_DEVICE)
+    return next(iter(devices.values()), None)
+
+
+for sn in (SerialNumbers if SerialNumbers else macAddrs) :
+    register(sn)
+
+
+#
+# Alert throttle times of every device, for the radonMaster state file
+#
+def alertState() :
+    state = dict(savedAlertTimes)
+    for sn, device in list(devices.items()) :
+        state[str(sn)] = copyAlertTimes(device.alertTimes)
+    return state
+
+
+def restoreAlertState(state) :
+    if "radon" in state :          # single device state file
+        state = {str(sn): state for sn in list(devices)[:1]}
+
+    for key, saved in state.items() :
+        if not isinstance(saved, dict) :
+            continue
+        device = devices.get(int(key)) if key.isdigit() else None
+        if device :
+            setAlertTimes(device.alertTimes, saved)
+        else :
+            savedAlertTimes[key] = saved
+
+
+#
+# Background scan for serial numbers and MAC addresses, one shared scanner
+#   Started at program start when an address is not cached and again when a
+#   connect to a cached address fails. Reads pick up the new addresses.
+#
+discovery = None
+
+def discover(serialNumbers) :
+    try :
+        found = find_wave2c.scanWaves(serialNumbers)
+    except Exception as e :       # adapter down, helper failed, ...
+        print("Wave discovery failed: " + str(e))
+        return
+
+    if found :
+        find_wave2c.saveCache(found)
+        macAddrs.update(found)
+        for sn in found :
+            if not SerialNumbers or sn in SerialNumbers :
+                register(sn)
+
+
+def startDiscovery(serialNumber=0) :
+    global discovery
+
+    if not find_wave2c.bluePyFound :
+        return
+
+    if serialNumber :
+        wanted = [serialNumber]
+    else :
+        wanted = [sn for sn in SerialNumbers if sn not in macAddrs]
+
+    if discovery is None or not discovery.is_alive() :
+        discovery = threading.Thread(target=discover, args=(wanted,), name="waveDiscovery", daemon=True)
+        discovery.start()
+
+
+def start() :
+    writeHeaders()
+    if not devices or not all(d.ready() for d in devices.values()) :
+        startDiscovery()
+
+
 #
 # Header row for log file or display
 #
 def writeHeaders() :
     global hdrRow
 
+    if not find_wave2c.bluePyFound :
+        return
+
     sensors = read_waveplus2c.Sensors()
 
     hdrRow = "Radon ST avg (" + str(sensors.getUnit(read_waveplus2c.SENSOR_IDX_RADON_SHORT_TERM_AVG)) \
@@ -278,87 +502,174 @@ def writeHeaders() :
                 + "),Humidity (" + str(sensors.getUnit(read_waveplus2c.SENSOR_IDX_HUMIDITY)) \
                 + "),Pressure (" + str(sensors.getUnit(read_waveplus2c.SENSOR_IDX_REL_ATM_PRESSURE)) + ")"
 
-    if MCP4725_ENABLED :
-        hdrRow += ",Fan"
-
     if MODE=='terminal' :
         # print(hdrRow[5:])
-        print(hdrRow)
+        print(hdrRow + (",Fan" if MCP4725_ENABLED else ""))
 
 
 
-#
-# Read AirThings Waveplus, log data to csv file
-#
 msgOnce = 1
 
-def readAirthings() :
+def ready() :
     global msgOnce
 
+    readyDevices = [d for d in list(devices.values()) if d.ready()]
+    if not readyDevices and msgOnce and not (discovery and discovery.is_alive()) :
+        msgOnce = 0
+        print("Wave not found! Try entering the serial numbers in SerialNumbers instead of scanning.")
+    return readyDevices
+
+
+#
+# Read every AirThings Waveplus in turn, log data to csv file (used when run as main)
+#
+def readAirthings() :
     results = ""
     alert = 0
 
-    if not SerialNumber :
-        if msgOnce :
-            msgonce = 0
-            print("Wave not found! Trying manually entering serial number into code instead of scanning.")
+    for device in ready() :
+        try:
+            deviceResults, deviceAlert = device.read()
+            results += deviceResults
+            alert = alert or deviceAlert
+
+        except read_waveplus2c.WavePlusError as e :
+            print("readAirthings() " + device.label() + " " + str(e))
+
+    return results, alert
+
+
+#
+# BLE worker threads
+#   radonMaster never calls bluepy itself. requestRead() queues a read of each
+#   device for the workers, which post (tsec, serial number, results, alert) for
+#   pollResults() to collect on a later tick. There are MAX_CONNECTIONS workers,
+#   so reads of several devices run in parallel without exceeding the adapter's
+#   connection limit. A queued read not started within READ_DEADLINE seconds is
+#   dropped and each read, connect included, is bounded by the session timeout.
+#
+READ_DEADLINE = 60.0     # seconds a read request may wait for a worker
+
+readRequests = queue.Queue()
+readResults = queue.Queue()
+
+workers = []
+
+
+def workLoop() :
+    while True :
+        request = readRequests.get()
+        if request is None :
+            break
+
+        device, deadline = request
+        tStart = time.monotonic()
+        if tStart > deadline :
+            device.late += 1
+            device.pending.clear()
+            continue
+
+        try :
+            results, alert = device.read()
+            device.latency.add(time.monotonic() - tStart)
+            readResults.put((time.time(), device.serialNumber, results, alert))
+
+        except read_waveplus2c.WavePlusError as e :
+            device.latency.fail()
+            print("readAirthings() " + device.label() + " " + str(e))
+
+        except Exception as e :
+            device.latency.fail()
+            device.errors += 1
+            print("readAirthings() {0} {1}: {2}".format(device.label(), type(e).__name__, e))
+
+        device.pending.clear()
+
+
+def startWorker() :
+    if workers or not find_wave2c.bluePyFound :
         return
 
-    try:
-        waveplus = read_waveplus2c.WavePlus(SerialNumber)
-        waveplus.connect()
-        sensors = waveplus.read()
-        waveplus.disconnect()
+    for i in range(MAX_CONNECTIONS) :
+        worker = threading.Thread(target=workLoop, name="waveWorker" + str(i), daemon=True)
+        worker.start()
+        workers.append(worker)
 
-        data, wavePlusString, alert = sensor2StringUnits(sensors)
 
-        if MCP4725_ENABLED :
-            fanValue = round(dac.alg(data),3)
-            # print("FanValue: ", fanValue)
-            data.append(fanValue)
-            wavePlusString.append('Fan value   : {0:7.2f}    '.format(fanValue))
+def requestRead() :
+    queued = 0
 
-        if LOGGING_ENABLED :
-            topic = "RadonMaster/WavePlus"
-            pubScribe.pubRecord(pubScribe.CSV_FILE, topic, data, hdrRow)
-        
-        results = ""
-        for item in wavePlusString :
-            results += item + "\n"
+    if not workers :
+        return queued
 
-    except :
-        print("readAirthings() Exception!")
-        waveplus.disconnect()
+    for device in ready() :
+        if device.pending.is_set() :
+            device.skipped += 1
+            continue
+
+        device.pending.set()
+        readRequests.put((device, time.monotonic() + READ_DEADLINE))
+        queued += 1
+
+    return queued
+
+
+# Completed reads since the last call, [(tsec, serial number, results, alert), ...]
+def pollResults() :
+    done = []
+    while True :
+        try :
+            done.append(readResults.get_nowait())
+        except queue.Empty :
+            return done
 
-    return results, alert
+
+def statsStr() :
+    return "\n".join(s for s in (d.statsStr() for d in list(devices.values())) if s)
+
+
+def stopWorker() :
+    for worker in workers :
+        readRequests.put(None)
+
+    tEnd = time.monotonic() + read_waveplus2c.WAVE_TIMEOUT + 1.0    # let reads in progress finish
+    for worker in workers :
+        worker.join(max(0.0, tEnd - time.monotonic()))
+    workers[:] = []
+
+    for device in list(devices.values()) :
+        if device.session :
+            device.session.close()
 
 
 if __name__ == '__main__':
 
     if (MODE=='terminal'):
         print("\nPress ctrl+C to exit program\n")
-        print("Device serial number: %s" %(SerialNumber))
+        print("Device serial numbers: %s" %(", ".join(str(sn) for sn in devices)))
         print("Sample Period: %u seconds" %(SamplePeriod))
         print("")
 
     pubScribe.connectPubScribe()
 
-    writeHeaders()
+    start()
 
     try :
         while True:
-            results, alert, s = readAirthings()
+            results, alert = readAirthings()
 
             if (MODE=='terminal'):
                 print(results)
 
                 if alert :
                     print("=== ALERT! ===")
-                    print(s)
+
+            print(statsStr())
 
             time.sleep(SamplePeriod)
             
     except KeyboardInterrupt:
         print(" Keyboard interrupt caught.")
 
+    stopWorker()
     pubScribe.disconnectPubScribe()